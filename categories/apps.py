@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class CategoriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'categories'
\ No newline at end of file
+    name = 'categories'
+
+    def ready(self):
+        # Keeps the materialized paths and the cached tree up to date
+        from . import signals  # noqa: F401
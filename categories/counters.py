@@ -0,0 +1,68 @@
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Category
+
+# ---
+# DENORMALIZED NOTE COUNTERS
+# ---
+# Category.note_count            notes filed directly in the category
+# Category.public_note_count     public notes filed directly in the category
+# Category.subtree_public_count  public notes in the category and everything below it
+#
+# Kept up to date with F() increments, in the same transaction as the
+# change (notes.signals for notes, Category.save()/categories.signals for
+# moves and deletes). Bulk queryset writes bypass them; run
+# `manage.py reconcile_category_counts` after those.
+
+
+def path_ids(path):
+    return [int(pk) for pk in path.strip('/').split('/') if pk]
+
+
+def adjust_note_counts(category_id, delta, public_delta):
+    """
+    Adds `delta` notes (`public_delta` of them public) to a category's
+    direct counters and `public_delta` to its and its ancestors' subtree counter.
+    """
+    if not category_id or not (delta or public_delta):
+        return
+    path = Category.objects.filter(pk=category_id).values_list('path', flat=True).first()
+    if not path:
+        return
+    Category.objects.filter(pk__in=path_ids(path)).update(
+        note_count=F('note_count') + Case(When(pk=category_id, then=Value(delta)), default=Value(0)),
+        public_note_count=F('public_note_count') + Case(When(pk=category_id, then=Value(public_delta)), default=Value(0)),
+        subtree_public_count=F('subtree_public_count') + public_delta,
+    )
+
+
+def adjust_subtree_counts(ancestor_ids, public_delta):
+    """Moves a whole subtree's public notes in or out of the given ancestors."""
+    if ancestor_ids and public_delta:
+        Category.objects.filter(pk__in=ancestor_ids).update(
+            subtree_public_count=F('subtree_public_count') + public_delta,
+        )
+
+
+def actual_counts():
+    """Annotations with the true counter values, computed from the notes table."""
+    from notes.models import Note
+
+    def count(queryset, group_by):
+        # Every row shares the grouping value, so this is one row: the count
+        return Coalesce(
+            Subquery(
+                queryset.order_by().values(group_by).annotate(n=Count('pk')).values('n')[:1],
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    notes = Note.objects.filter(category=OuterRef('pk'))
+    public_subtree = Note.objects.filter(is_public=True, category__path__startswith=OuterRef('path'))
+    return {
+        'actual_note_count': count(notes, 'category'),
+        'actual_public_note_count': count(notes.filter(is_public=True), 'category'),
+        'actual_subtree_public_count': count(public_subtree, 'is_public'),
+    }
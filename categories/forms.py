@@ -25,6 +25,9 @@ class CategoryForm(forms.ModelForm):
         self.fields['parent'].required = False
         # Add a "None" option to the parent field for clarity
         self.fields['parent'].empty_label = "None (Top-Level Category)"
+        # A category can't move under itself or its own sub-categories
+        if self.instance.pk:
+            self.fields['parent'].queryset = Category.objects.exclude(path__startswith=self.instance.path)
 
     class Meta:
         model = Category
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from categories.counters import actual_counts
+from categories.models import COUNTER_FIELDS, Category
+
+
+class Command(BaseCommand):
+    help = 'Recomputes (or, with --check, verifies) every category\'s stored note counters from the notes table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report categories whose counters have drifted; exit non-zero on drift.')
+
+    def handle(self, *args, **options):
+        drift = Q()
+        for field in COUNTER_FIELDS:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = Category.objects.annotate(**actual_counts()).filter(drift)
+
+        if options['check']:
+            count = 0
+            for category in drifted.order_by('path'):
+                count += 1
+                self.stdout.write(category.name + ': ' + ', '.join(
+                    f'{field} {getattr(category, field)} (actual {getattr(category, "actual_" + field)})'
+                    for field in COUNTER_FIELDS
+                ))
+            if count:
+                raise CommandError(f'{count} categor{"y" if count == 1 else "ies"} out of sync with their notes.')
+            self.stdout.write(self.style.SUCCESS('All category note counters are correct.'))
+            return
+
+        # One set-based UPDATE of the drifted rows
+        actual = actual_counts()
+        updated = drifted.update(**{field: actual[f'actual_{field}'] for field in COUNTER_FIELDS})
+        self.stdout.write(self.style.SUCCESS(f'Category note counters reconciled ({updated} categor{"y" if updated == 1 else "ies"} corrected).'))
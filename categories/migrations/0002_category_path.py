@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:33
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    # Level by level from the roots: one UPDATE per category, once
+    Category = apps.get_model('categories', 'Category')
+    level = list(Category.objects.filter(parent__isnull=True).values_list('pk', flat=True))
+    paths = {}
+    for pk in level:
+        paths[pk] = (f'/{pk}/', 0)
+    while level:
+        children = list(Category.objects.filter(parent_id__in=level).values_list('pk', 'parent_id'))
+        level = []
+        for pk, parent_id in children:
+            if pk in paths:
+                continue  # guards against parent cycles in old data
+            parent_path, parent_depth = paths[parent_id]
+            paths[pk] = (f'{parent_path}{pk}/', parent_depth + 1)
+            level.append(pk)
+    for pk, (path, depth) in paths.items():
+        Category.objects.filter(pk=pk).update(path=path, depth=depth)
+    # Anything left is part of a cycle: make it top-level
+    for pk in Category.objects.exclude(pk__in=paths.keys()).values_list('pk', flat=True):
+        Category.objects.filter(pk=pk).update(parent=None, path=f'/{pk}/', depth=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
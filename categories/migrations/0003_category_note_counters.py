@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:39
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    # One set-based UPDATE (same expressions as reconcile_category_counts)
+    Category = apps.get_model('categories', 'Category')
+    Note = apps.get_model('notes', 'Note')
+
+    def count(queryset, group_by):
+        return Coalesce(
+            Subquery(
+                queryset.order_by().values(group_by).annotate(n=Count('pk')).values('n')[:1],
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    notes = Note.objects.filter(category=OuterRef('pk'))
+    Category.objects.update(
+        note_count=count(notes, 'category'),
+        public_note_count=count(notes.filter(is_public=True), 'category'),
+        subtree_public_count=count(
+            Note.objects.filter(is_public=True, category__path__startswith=OuterRef('path')), 'is_public'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_category_path'),
+        ('notes', '0010_note_category_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='note_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='public_note_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_public_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
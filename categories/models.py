@@ -1,6 +1,11 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.urls import reverse
 
+COUNTER_FIELDS = ('note_count', 'public_note_count', 'subtree_public_count')
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
@@ -14,15 +19,107 @@ class Category(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # --- MATERIALIZED PATH ---
+    # Ids from the root down to this category, e.g. "/1/5/12/" for
+    # Science(1) > Physics(5) > Quantum(12). The whole subtree of a category
+    # is `path LIKE '<its path>%'` (an index range scan) and its ancestors
+    # are the ids in its path. Maintained by save() and categories.signals.
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    # --- NOTE COUNTERS (maintained by categories/counters.py) ---
+    note_count = models.IntegerField(default=0, editable=False)
+    public_note_count = models.IntegerField(default=0, editable=False)
+    subtree_public_count = models.IntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ['name']
         verbose_name_plural = "Categories" # Fixes the "Categorys" typo in admin
+        indexes = [
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
-        # Show hierarchy in admin dropdowns
-        if self.parent:
-            return f"{self.parent} > {self.name}"
+        # Show hierarchy in admin dropdowns, read from the cached tree (no queries)
+        from .tree import get_category_tree
+        if self.pk:
+            label = get_category_tree().label(self.pk)
+            if label:
+                return label
         return self.name
     
     def get_absolute_url(self):
-        return reverse('categories:category-detail', kwargs={'pk': self.pk})
\ No newline at end of file
+        return reverse('categories:category-detail', kwargs={'pk': self.pk})
+
+    # --- TREE HELPERS (one query each; the cached categories.tree needs none) ---
+    @property
+    def ancestor_ids(self):
+        """Ids of all ancestors, root first (no query)."""
+        return [int(pk) for pk in self.path.strip('/').split('/')[:-1] if pk]
+
+    def get_ancestors(self):
+        return Category.objects.filter(pk__in=self.ancestor_ids).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        if not self.path:
+            return Category.objects.none()
+        queryset = Category.objects.filter(path__startswith=self.path)
+        return queryset if include_self else queryset.exclude(pk=self.pk)
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if f'/{self.pk}/' in parent_path:
+                raise ValidationError({'parent': "A category can't be moved under itself or one of its sub-categories."})
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.parent_id:
+                parent_path, parent_depth = Category.objects.select_for_update().filter(
+                    pk=self.parent_id
+                ).values_list('path', 'depth').get()
+                if self.pk and f'/{self.pk}/' in parent_path:
+                    raise ValueError("A category can't be moved under itself or one of its sub-categories.")
+                prefix, depth = parent_path, parent_depth + 1
+            else:
+                prefix, depth = '/', 0
+
+            old_path = self.path
+            if self.pk is None:
+                # The path ends with our own id, which we only know after the INSERT
+                super().save(*args, **kwargs)
+                self.path, self.depth = f'{prefix}{self.pk}/', depth
+                Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+                return
+
+            self.path, self.depth = f'{prefix}{self.pk}/', depth
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                # Never write back the counters this instance was loaded with;
+                # they are only ever changed with F() increments
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in COUNTER_FIELDS
+                ]
+            kwargs['update_fields'] = (set(update_fields) - set(COUNTER_FIELDS)) | {'path', 'depth'}
+            super().save(*args, **kwargs)
+            if old_path and old_path != self.path:
+                # Moved: rewrite the paths of the whole subtree in one UPDATE
+                rebase_subtree(old_path, self.path, self.depth - old_path.count('/') + 2)
+                # ...and carry its public notes from the old ancestors to the new ones
+                from .counters import adjust_subtree_counts, path_ids
+                moved = Category.objects.filter(pk=self.pk).values_list('subtree_public_count', flat=True).get()
+                adjust_subtree_counts(path_ids(old_path)[:-1], -moved)
+                adjust_subtree_counts(path_ids(self.path)[:-1], moved)
+
+
+def rebase_subtree(old_prefix, new_prefix, depth_delta):
+    """
+    Replaces `old_prefix` with `new_prefix` at the start of every path
+    under it (excluding the exact old_prefix row), shifting depths.
+    """
+    return Category.objects.filter(path__startswith=old_prefix).exclude(path=old_prefix).update(
+        path=Concat(Value(new_prefix), Substr('path', len(old_prefix) + 1)),
+        depth=F('depth') + depth_delta,
+    )
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .counters import adjust_subtree_counts, path_ids
+from .models import Category, rebase_subtree
+from .tree import invalidate_category_tree
+
+
+# ---
+# MATERIALIZED PATH MAINTENANCE
+# ---
+@receiver(pre_delete, sender=Category)
+def category_pre_delete(sender, instance, **kwargs):
+    # The current counter, not whatever the instance was loaded with
+    instance._subtree_public_count = Category.objects.filter(pk=instance.pk).values_list(
+        'subtree_public_count', flat=True
+    ).first() or 0
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # on_delete=SET_NULL already made the children top-level (without
+    # calling save()), so their subtrees lose the deleted prefix, and the
+    # ancestors lose the whole subtree from their counts.
+    if instance.path:
+        rebase_subtree(instance.path, '/', -(instance.depth + 1))
+        adjust_subtree_counts(path_ids(instance.path)[:-1], -getattr(instance, '_subtree_public_count', 0))
+
+
+# ---
+# CACHED TREE INVALIDATION
+# ---
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_tree_changed(sender, **kwargs):
+    # After commit, so no process rebuilds the new version from old rows
+    transaction.on_commit(invalidate_category_tree)
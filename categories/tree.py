@@ -0,0 +1,153 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.dbrouter import use_primary
+
+# ---
+# CACHED CATEGORY TREE
+# ---
+# The whole hierarchy, built from one query and shared through the cache,
+# for breadcrumbs, "A > B > C" labels and dropdowns without touching the
+# database. categories.signals bumps the version on every Category change;
+# each process keeps its last tree in memory and only reloads it (from
+# the cache, or by rebuilding) when the version moved on.
+#
+# The version itself is looked up at most every CATEGORY_TREE_CHECK_INTERVAL
+# seconds per process, not on every str(category) in a dropdown. It expires
+# after CATEGORY_TREE_TIMEOUT, which bounds how long a process whose cache
+# isn't shared (LocMemCache) can miss another process's change.
+
+CATEGORY_TREE_VERSION_KEY = 'categories:tree:version'
+
+_local = {'version': None, 'tree': None, 'checked_at': None}
+_local_lock = threading.Lock()
+
+
+class CategoryNode:
+    __slots__ = ('pk', 'name', 'parent_id', 'path', 'depth', 'parent', 'children', 'label')
+
+    def __init__(self, pk, name, parent_id, path, depth):
+        self.pk = pk
+        self.name = name
+        self.parent_id = parent_id
+        self.path = path
+        self.depth = depth
+        self.parent = None
+        self.children = []
+        self.label = name
+
+    def __str__(self):
+        return self.label
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.rows = rows
+        # Set by get_category_tree(); keys template fragments built from the tree
+        self.version = None
+        self.nodes = {row['pk']: CategoryNode(**row) for row in rows}
+        self.roots = []
+        # rows come sorted by name, so children lists end up sorted too
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                node.parent = parent
+                parent.children.append(node)
+        for node in self.walk():
+            if node.parent is not None:
+                node.label = f'{node.parent.label} > {node.name}'
+
+    # Only the rows are pickled into the cache; the links are rebuilt on load
+    def __getstate__(self):
+        return self.rows
+
+    def __setstate__(self, rows):
+        self.__init__(rows)
+
+    def get(self, pk):
+        return self.nodes.get(pk)
+
+    def label(self, pk):
+        node = self.nodes.get(pk)
+        return node.label if node else None
+
+    def ancestors(self, pk):
+        """Nodes above `pk`, root first."""
+        chain = []
+        node = self.nodes.get(pk)
+        while node is not None and node.parent is not None:
+            node = node.parent
+            chain.append(node)
+        return chain[::-1]
+
+    def breadcrumbs(self, pk):
+        """Ancestors of `pk` followed by `pk` itself."""
+        node = self.nodes.get(pk)
+        return self.ancestors(pk) + [node] if node else []
+
+    def descendants(self, pk, include_self=False):
+        node = self.nodes.get(pk)
+        if node is None:
+            return []
+        found = list(self.walk(node.children))
+        return [node] + found if include_self else found
+
+    def walk(self, nodes=None):
+        """Depth-first, alphabetical within each level: the order for dropdowns."""
+        stack = list(reversed(self.roots if nodes is None else nodes))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def choices(self):
+        return [(node.pk, node.label) for node in self.walk()]
+
+
+def build_category_tree():
+    from .models import Category
+    rows = Category.objects.order_by('name').values('pk', 'name', 'parent_id', 'path', 'depth')
+    return CategoryTree(list(rows))
+
+
+def get_category_tree():
+    now = time.monotonic()
+    with _local_lock:
+        checked_at = _local['checked_at']
+        if checked_at is not None and now - checked_at < settings.CATEGORY_TREE_CHECK_INTERVAL:
+            return _local['tree']
+
+    version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    if version is None:
+        version = invalidate_category_tree()
+    with _local_lock:
+        if _local['version'] == version:
+            _local['checked_at'] = now
+            return _local['tree']
+
+    tree_key = f'categories:tree:{version}'
+    tree = cache.get(tree_key)
+    if tree is None:
+        # A lagging replica would store the old tree under the new version
+        with use_primary():
+            tree = build_category_tree()
+        cache.set(tree_key, tree, settings.CATEGORY_TREE_TIMEOUT)
+    tree.version = version
+    with _local_lock:
+        _local['version'], _local['tree'], _local['checked_at'] = version, tree, now
+    return tree
+
+
+def invalidate_category_tree():
+    """Starts a new tree version; every process picks it up on its next read."""
+    version = time.time_ns()
+    cache.set(CATEGORY_TREE_VERSION_KEY, version, settings.CATEGORY_TREE_TIMEOUT)
+    with _local_lock:
+        # This process sees its own change right away
+        _local['checked_at'] = None
+    return version
@@ -4,8 +4,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
 from .models import Category
+from .tree import get_category_tree
 from notes.models import Note
+from notes.pagination import CursorPaginator
 from .forms import CategoryForm
+from core.pagecache import AnonymousPageCacheMixin
 from django.db import models
 
 # A mixin to check if the user is a Teacher or Admin
@@ -18,27 +21,58 @@ class TeacherOrAdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
         messages.error(self.request, "You do not have permission to perform this action.")
         return redirect('categories:category-list')
 
-class CategoryListView(ListView):
+class CategoryListView(AnonymousPageCacheMixin, ListView):
     model = Category
     template_name = 'categories/category_list.html'
     context_object_name = 'categories'
+    query_budget = 5
+    reads_from_replica = True
+
+    def get_page_cache_groups(self):
+        return ['categories', 'category-counts']
     
     def get_queryset(self):
-        # Optimize by fetching note count in the same query
-        return Category.objects.annotate(note_count=models.Count('notes')).order_by('name')
+        # note_count is a stored counter (categories/counters.py), no GROUP BY needed
+        return Category.objects.select_related('parent').order_by('name')
 
 class CategoryDetailView(DetailView):
     model = Category
     template_name = 'categories/category_detail.html' # We'll create this later
     context_object_name = 'category'
+    paginate_by = 12
+    query_budget = 9
+    reads_from_replica = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get all public notes in this category
-        context['notes'] = Note.objects.filter(
-            category=self.object, 
-            is_public=True
-        ).select_related('uploader')
+        tree = get_category_tree()
+        node = tree.get(self.object.pk)
+        subtree_ids = [n.pk for n in tree.descendants(self.object.pk, include_self=True)] or [self.object.pk]
+
+        # Public notes of this category and everything below it, newest first,
+        # one keyset page at a time (tags loaded in one batch for the page)
+        notes = (
+            Note.objects.filter(category_id__in=subtree_ids, is_public=True)
+            .select_related('uploader', 'category')
+            .prefetch_related('tags')
+            .defer(*Note.CARD_DEFERRED_FIELDS)
+        )
+        paginator = CursorPaginator(notes, self.paginate_by, ordering=['-created_at'])
+        page = paginator.page(self.request.GET.get('cursor'))
+        context['notes'] = page.object_list
+        context['page_obj'] = page
+        context['is_paginated'] = page.has_other_pages()
+
+        # Per-child and total counts straight from the stored subtree counters
+        # (parent is loaded too: the related manager reads it on every child)
+        context['subcategories'] = [
+            (child, child.subtree_public_count)
+            for child in self.object.children.order_by('name').only('name', 'parent', 'subtree_public_count')
+        ]
+        context['subtree_note_count'] = self.object.subtree_public_count
+
+        # Root-to-here trail from the cached tree (no queries)
+        context['breadcrumbs'] = tree.breadcrumbs(self.object.pk)
         return context
 
 class CategoryCreateView(TeacherOrAdminRequiredMixin, CreateView):
@@ -78,8 +112,8 @@ class CategoryDeleteView(TeacherOrAdminRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        # Check if category has notes
-        if self.object.notes.exists():
+        # Check if category has notes (stored counter, no query)
+        if self.object.note_count:
             messages.error(request, f'Cannot delete "{self.object.name}". It is still linked to notes. Please reassign them first.')
             return redirect(self.success_url)
         
@@ -1,10 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User # Import your custom User model
+from django.utils import timezone
+from .forms import UserAdminChangeForm
+from .models import User, ReputationEvent, Job # Import your custom User model
 
 # Optional: Customize how the User model appears in the admin
 class CustomUserAdmin(UserAdmin):
     model = User
+    form = UserAdminChangeForm
     # --- NEW: Add 'reputation' to the list display ---
     list_display = (
         'username', 
@@ -19,8 +22,10 @@ class CustomUserAdmin(UserAdmin):
     
     # --- NEW: Add 'reputation' to the main fieldsets ---
     fieldsets = UserAdmin.fieldsets + (
-        ('Account Type', {'fields': ('role', 'profile_image', 'bio', 'reputation')}), # <-- ADDED 'reputation'
+        ('Account Type', {'fields': ('role', 'profile_image', 'bio', 'reputation', 'reputation_adjustment')}), # <-- ADDED 'reputation'
     )
+    # Changed through reputation_adjustment, see save_model()
+    readonly_fields = ('reputation',)
     
     # Add 'role' to the add user form
     add_fieldsets = UserAdmin.add_fieldsets + (
@@ -30,8 +35,61 @@ class CustomUserAdmin(UserAdmin):
     # Make 'role' and 'is_active' filterable
     list_filter = UserAdmin.list_filter + ('role', 'is_active',)
     
-    # --- NEW: Make reputation editable ---
-    list_editable = ('role', 'is_active', 'reputation',)
+    list_editable = ('role', 'is_active',)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Reputation is a counter that rating jobs move with F() updates
+        # (ReputationEvent.objects.record), so the row is saved without it:
+        # writing back the value loaded for this form could undo them.
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name != 'reputation'
+        ])
+        adjustment = form.cleaned_data.get('reputation_adjustment')
+        if adjustment:
+            ReputationEvent.objects.record(obj, adjustment, ReputationEvent.ADJUSTMENT)
+            obj.refresh_from_db(fields=['reputation'])
 
 # Register your custom User model with the custom admin class
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(User, CustomUserAdmin)
+
+
+# ---
+# REPUTATION LEDGER ADMIN (read-only audit trail)
+# ---
+@admin.register(ReputationEvent)
+class ReputationEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'delta', 'reason', 'note', 'created_at')
+    list_filter = ('reason', 'created_at')
+    search_fields = ('user__username',)
+    list_select_related = ('user', 'note')
+    readonly_fields = ('user', 'delta', 'reason', 'note', 'rating', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ---
+# BACKGROUND JOBS ADMIN (inspect failures, retry dead letters)
+# ---
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'updated_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('name', 'payload', 'attempts', 'locked_at', 'locked_by', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Retry selected jobs now")
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), updated_at=timezone.now(),
+        )
+        self.message_user(request, f"{count} job(s) queued again.")
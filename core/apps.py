@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'   
\ No newline at end of file
+    name = 'core'
+
+    def ready(self):
+        # Register signal handlers (dashboard snapshot invalidation)
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .pagecache import has_pending_messages
+
+# ---
+# CONDITIONAL GET FOR RENDERED PAGES
+# ---
+# Pages built from a few rows (a note, a list of notes) get validators
+# computed from those rows with one cheap query, before the page itself is
+# loaded or rendered. When the browser or the proxy revalidates with
+# If-None-Match / If-Modified-Since and nothing changed, it gets a 304 and
+# the heavy queries and the template never run.
+#
+# The ETag covers the data parts the view declares plus who is looking
+# (name, role, CSRF cookie: the page embeds them) and RELEASE_VERSION, so a
+# deploy with new templates changes every validator. Last-Modified is only
+# sent to guests: a signed-in viewer's own parts (e.g. their vote) have no
+# timestamp. Views whose data can change without a newer timestamp (lists
+# that notes leave) return None for it. Responses are marked no-cache, so
+# caches always revalidate.
+
+
+def _viewer_parts(request):
+    user = request.user
+    if not user.is_authenticated:
+        return ['anonymous']
+    return [
+        user.pk, user.username, user.first_name, user.last_name, user.role, user.is_staff,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+
+
+def page_etag(request, parts):
+    """Weak ETag (the CSRF token in the HTML differs byte-wise per response) for `parts`."""
+    values = [settings.RELEASE_VERSION] + _viewer_parts(request) + list(parts)
+    digest = hashlib.sha256('|'.join(map(str, values)).encode()).hexdigest()[:32]
+    return 'W/' + quote_etag(digest)
+
+
+def _validators(request, parts, last_modified):
+    etag = page_etag(request, parts)
+    if request.user.is_authenticated or last_modified is None:
+        return etag, None
+    return etag, int(last_modified.timestamp())
+
+
+def _with_validators(request, response, etag, timestamp):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        cache_control = {'no_cache': True}
+        if request.user.is_authenticated:
+            cache_control['private'] = True
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def conditional_get(request, get_validators, render):
+    """
+    A 304 when the client's copy is current, else `render()`, with the
+    validators set. `get_validators()` returns (parts, last_modified): the
+    values the page is rendered from, and when they last changed (or None).
+    """
+    # Pending flash messages must be shown, not skipped with a 304
+    if has_pending_messages(request):
+        return render()
+    etag, timestamp = _validators(request, *get_validators())
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+    return _with_validators(request, response, etag, timestamp)
+
+
+async def aconditional_get(request, get_validators, render):
+    """conditional_get() for async views: both callables return coroutines. Needs request.user loaded."""
+    if has_pending_messages(request):
+        return await render()
+    etag, timestamp = _validators(request, *await get_validators())
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = await render()
+    return _with_validators(request, response, etag, timestamp)
+
+
+class ConditionalPageMixin:
+    """
+    conditional_get() for a class-based view's GET/HEAD: implement
+    get_validators(), returning (parts, last_modified).
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        return conditional_get(
+            request, self.get_validators,
+            lambda: super(ConditionalPageMixin, self).get(request, *args, **kwargs),
+        )
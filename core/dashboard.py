@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from categories.models import Category
+from notes.models import Note
+from .dbrouter import use_primary
+from .models import User
+
+# ---
+# DASHBOARD SNAPSHOT
+# ---
+# Everything on the dashboard that is the same for every user is computed
+# once, stored in the cache, and dropped by core.signals whenever a note,
+# rating, category or user changes. DASHBOARD_CACHE_TIMEOUT bounds how
+# stale it can get when a change happens in another process.
+
+DASHBOARD_CACHE_KEY = 'dashboard:snapshot'
+
+
+def build_dashboard_snapshot():
+    """Runs the dashboard queries and returns a picklable dict of the results."""
+    note_cards = Note.objects.select_related('uploader', 'category').defer(*Note.CARD_DEFERRED_FIELDS).filter(is_public=True)
+    category_notes = list(Category.objects.only('name', 'note_count').order_by('-note_count'))
+
+    return {
+        # Top stat cards
+        'note_count': Note.objects.count(),
+        'category_count': len(category_notes),
+        'user_count': User.objects.filter(is_active=True).count(),
+
+        # Chart data: notes per category
+        'category_chart_labels': json.dumps([c.name for c in category_notes]),
+        'category_chart_data': json.dumps([c.note_count for c in category_notes]),
+
+        # Recent/Top notes
+        'recent_notes': list(note_cards.order_by('-created_at')[:5]),
+        'top_notes': list(note_cards.order_by('-average_rating')[:5]),
+
+        # Leaderboard
+        'top_users': list(User.objects.filter(is_active=True).order_by('-reputation')[:5]),
+
+        # Changes whenever the snapshot is rebuilt; keys the template fragments
+        'dashboard_version': time.time_ns(),
+    }
+
+
+def get_dashboard_snapshot():
+    """Returns the cached snapshot, rebuilding it if it was invalidated or expired."""
+    snapshot = cache.get(DASHBOARD_CACHE_KEY)
+    if snapshot is None:
+        # From the primary: the snapshot was just dropped because data changed there
+        with use_primary():
+            snapshot = build_dashboard_snapshot()
+        cache.set(DASHBOARD_CACHE_KEY, snapshot, settings.DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_dashboard_snapshot():
+    cache.delete(DASHBOARD_CACHE_KEY)
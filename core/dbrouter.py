@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# ---
+# PRIMARY / READ REPLICA ROUTING
+# ---
+# Writes always go to 'default' (the primary). Reads go to a replica only
+# during GET/HEAD requests to views marked read-only:
+#
+#       class NoteListView(ListView):
+#           reads_from_replica = True
+#
+#       @reads_from_replica
+#       def dashboard_view(request): ...
+#
+# and only while all of these hold (core.middleware.DatabaseRoutingMiddleware):
+#
+# - the client did not write in the last REPLICA_STICKY_SECONDS (a cookie
+#   set after every request that wrote), so people see their own changes;
+# - the request itself has not written yet;
+# - the replica answers and lags at most REPLICA_MAX_LAG seconds behind,
+#   checked every REPLICA_CHECK_INTERVAL seconds per process. With no
+#   usable replica, reads fall back to the primary.
+#
+# Shared caches that are invalidated on writes (category tree, dashboard
+# snapshot, guest page cache) are refilled inside use_primary(): a lagging
+# replica would otherwise put the old data back under the new version.
+
+PRIMARY = 'default'
+PIN_COOKIE_NAME = 'db_primary_until'
+# Always read from the primary: sessions are written on every request
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_routing = ContextVar('edushare_db_routing', default=None)
+
+_health_lock = threading.Lock()
+# {alias: (checked_at, usable)}
+_health = {}
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    """Routing decisions for one request."""
+
+    def __init__(self):
+        self.replica_allowed = False
+        self.replica = None
+        self.wrote = False
+
+
+def reads_from_replica(view):
+    """Marks a view (function or class) as read-only, so GET/HEAD requests may read from a replica."""
+    view.reads_from_replica = True
+    return view
+
+
+def view_reads_from_replica(view_func):
+    # Class-based views: the as_view() function keeps the class in view_class
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_class, 'reads_from_replica', False) or getattr(view_func, 'reads_from_replica', False)
+
+
+def begin_request():
+    state = RoutingState()
+    return state, _routing.set(state)
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def current_state():
+    return _routing.get()
+
+
+@contextmanager
+def use_primary():
+    """Reads inside the block go to the primary, whatever the request allows."""
+    state = _routing.get()
+    if state is None:
+        yield
+        return
+    allowed = state.replica_allowed
+    state.replica_allowed = False
+    try:
+        yield
+    finally:
+        state.replica_allowed = allowed
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE_NAME, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin_to_primary(response):
+    """Keeps the client on the primary for the next REPLICA_STICKY_SECONDS."""
+    seconds = settings.REPLICA_STICKY_SECONDS
+    response.set_cookie(
+        PIN_COOKIE_NAME, str(int(time.time() + seconds)), max_age=seconds,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary, or None if it can't be reached."""
+    connection = connections[alias]
+    # Connecting (with its type lookups) and the check itself are not the
+    # request's queries: kept out of its metrics and query budget
+    wrappers, connection.execute_wrappers = connection.execute_wrappers, []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        connection.close()
+        return None
+    finally:
+        connection.execute_wrappers = wrappers
+
+
+def usable_replicas():
+    now = time.monotonic()
+    usable = []
+    for alias in settings.REPLICA_DATABASES:
+        with _health_lock:
+            checked_at, ok = _health.get(alias, (None, False))
+        if checked_at is None or now - checked_at >= settings.REPLICA_CHECK_INTERVAL:
+            lag = replica_lag(alias)
+            ok = lag is not None and lag <= settings.REPLICA_MAX_LAG
+            with _health_lock:
+                _health[alias] = (now, ok)
+        if ok:
+            usable.append(alias)
+    return usable
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica_allowed or state.wrote or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY
+        if state.replica is None:
+            # One replica for the whole request, so its reads are consistent
+            replicas = usable_replicas()
+            state.replica = random.choice(replicas) if replicas else PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary
+        return db == PRIMARY
@@ -1,5 +1,5 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from .models import User # Import our custom User model
 
 class CustomUserCreationForm(UserCreationForm):
@@ -41,4 +41,20 @@ class CustomUserCreationForm(UserCreationForm):
         self.fields['password1'].widget.attrs.update({
             'class': self.FORM_INPUT_CLASSES,
             'placeholder': 'Enter a strong password'
-        })
\ No newline at end of file
+        })
+
+
+# ---
+# ADMIN USER FORM
+# ---
+class UserAdminChangeForm(UserChangeForm):
+    # Reputation itself is read-only in the admin (it is a counter moved
+    # with F() updates); admins change it by a difference instead, which
+    # is recorded in the reputation ledger
+    reputation_adjustment = forms.IntegerField(
+        required=False,
+        help_text="Points to add to the user's reputation (negative to subtract). Recorded as a manual adjustment.",
+    )
+
+    class Meta(UserChangeForm.Meta):
+        model = User
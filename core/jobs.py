@@ -0,0 +1,16 @@
+from .models import User, ReputationEvent
+from .queue import job
+
+
+@job('core.record_reputation')
+def record_reputation(user_id, delta, reason, note_id=None, rating_id=None):
+    """Queued form of ReputationEvent.objects.record()."""
+    from notes.models import Note, Rating
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return  # account deleted in the meantime
+    # The note or rating may be gone by now; the event is kept without it
+    note = Note.objects.filter(pk=note_id).first() if note_id else None
+    rating = Rating.objects.filter(pk=rating_id).first() if rating_id else None
+    ReputationEvent.objects.record(user, delta, reason, note=note, rating=rating)
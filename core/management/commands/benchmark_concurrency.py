@@ -0,0 +1,456 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import User
+from notes.models import Note, Rating
+from .benchmark_views import DEFAULT_QUERIES, PERCENTILES, percentile
+
+# ---
+# WSGI vs ASGI CONCURRENCY BENCHMARK
+# ---
+# Serves the same signed-in mix of note list, search, detail and rating
+# requests at a fixed worker count, in three ways:
+#
+#   wsgi        sync views, WSGI handler, --workers threads (gunicorn gthread)
+#   asgi-sync   sync views, ASGI handler, --workers event loops (uvicorn workers)
+#   asgi        the async views (ASYNC_VIEWS=True) on the same event loops
+#
+# --concurrency clients each send their next request as soon as the last one
+# is answered. A WSGI worker holds its thread for the whole request, so at
+# most --workers requests are in flight; an event loop keeps taking requests
+# while earlier ones wait on the database. --db-latency adds a sleep to
+# every query, standing in for the network between app and PostgreSQL.
+#
+# Each mode runs in its own process (URLs are picked at import time), with
+# the app called in-process: no sockets, so the numbers are about how the
+# app waits, not about the server. Votes are re-submitted with the values
+# the user already gave, so no data changes; the sessions are deleted after.
+
+MODES = ('wsgi', 'asgi-sync', 'asgi')
+HOST = 'testserver'
+
+
+class DatabaseLatency:
+    """execute_wrapper that sleeps before every query, like a remote database would."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        # Connections are opened per thread, so every new one gets it
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class BenchRequest:
+    """One HTTP request, turned into a WSGI environ or an ASGI scope."""
+
+    def __init__(self, method, path, params=None, data=None, cookies=None, csrf_token=''):
+        self.method = method
+        self.path = path
+        self.query_string = urlencode(params or {})
+        self.body = urlencode(data).encode() if data else b''
+        self.headers = {
+            'host': HOST,
+            'cookie': '; '.join(f'{name}={value}' for name, value in (cookies or {}).items()),
+        }
+        if method == 'POST':
+            self.headers.update({
+                'content-type': 'application/x-www-form-urlencoded',
+                'content-length': str(len(self.body)),
+                'x-csrftoken': csrf_token,
+                'referer': f'https://{HOST}/',
+            })
+
+    def environ(self):
+        environ = {
+            'REQUEST_METHOD': self.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': self.path,
+            'QUERY_STRING': self.query_string,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '443',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'https',
+            'wsgi.input': io.BytesIO(self.body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in self.headers.items():
+            if name in ('content-type', 'content-length'):
+                environ[name.upper().replace('-', '_')] = value
+            else:
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+        return environ
+
+    def scope(self):
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': self.method,
+            'scheme': 'https',
+            'path': self.path,
+            'raw_path': self.path.encode(),
+            'query_string': self.query_string.encode(),
+            'root_path': '',
+            'headers': [(name.encode(), value.encode()) for name, value in self.headers.items()],
+            'client': ('127.0.0.1', 0),
+            'server': (HOST, 443),
+        }
+
+
+class Stats:
+    """Latencies and status codes from all clients, plus the most requests the app held at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.statuses = {}
+        self.errors = []
+        self.in_flight = self.peak_in_flight = 0
+
+    def entered(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def left(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def record(self, latency, status=None, error=None):
+        with self.lock:
+            self.latencies.append(latency)
+            if error is not None:
+                self.errors.append(error)
+                status = 'error'
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares how many concurrent note list/search/detail/rating requests the app serves at a fixed '
+        'worker count under WSGI, under ASGI with the sync views and under ASGI with the async views.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=MODES,
+                            help=f'Mode to run; repeatable (default: all of {", ".join(MODES)}).')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='WSGI threads, or ASGI event loops (default: 4).')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Clients sending requests at the same time (default: 32).')
+        parser.add_argument('--requests', type=int, default=400,
+                            help='Measured requests per mode (default: 400).')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Unmeasured requests per view first, to warm caches (default: 5).')
+        parser.add_argument('--db-latency', type=float, default=5.0,
+                            help='Milliseconds added to every query, 0 for none (default: 5).')
+        parser.add_argument('--user', help='Username to sign in as (default: the first active non-staff user).')
+        parser.add_argument('--output', default='benchmarks/concurrency.json',
+                            help='Where to write the results (default: benchmarks/concurrency.json).')
+        # Set on the per-mode child processes
+        parser.add_argument('--run-mode', choices=MODES, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        for name in ('workers', 'concurrency', 'requests'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1.')
+
+        if options['run_mode']:
+            result = self.run_mode(options['run_mode'], options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = {}
+        for mode in options['modes'] or MODES:
+            results[mode] = self.spawn(mode, options)
+            self.report(mode, results[mode])
+
+        output = {
+            'created_at': timezone.now().isoformat(),
+            'machine': platform.node(),
+            'python': platform.python_version(),
+            'workers': options['workers'],
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'db_latency_ms': options['db_latency'],
+            'modes': results,
+        }
+        directory = os.path.dirname(options['output'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(options['output'], 'w') as fh:
+            json.dump(output, fh, indent=2)
+            fh.write('\n')
+        self.stdout.write(f'Results written to {options["output"]}.')
+
+    def spawn(self, mode, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_concurrency',
+            '--run-mode', mode,
+            '--workers', str(options['workers']),
+            '--concurrency', str(options['concurrency']),
+            '--requests', str(options['requests']),
+            '--warmup', str(options['warmup']),
+            '--db-latency', str(options['db_latency']),
+        ]
+        if options['user']:
+            command += ['--user', options['user']]
+        env = dict(os.environ, ASYNC_VIEWS='True' if mode == 'asgi' else 'False')
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            self.stderr.write(process.stderr)
+            raise CommandError(f'The {mode} run failed.')
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode:<10} {result["throughput"]:8.1f} req/s  p50 {result["p50_ms"]:8.2f}ms  '
+            f'p95 {result["p95_ms"]:8.2f}ms  p99 {result["p99_ms"]:8.2f}ms  '
+            f'peak in flight {result["peak_in_flight"]:3d}  '
+            f'status {", ".join(f"{status}x{count}" for status, count in sorted(result["statuses"].items()))}'
+        )
+
+    # --- One mode, in the child process ---
+
+    def run_mode(self, mode, options):
+        if (mode == 'asgi') != settings.ASYNC_VIEWS:
+            raise CommandError(f'The {mode} mode needs ASYNC_VIEWS={mode == "asgi"}.')
+        if options['db_latency'] > 0:
+            connection_created.connect(DatabaseLatency(options['db_latency'] / 1000).install, weak=False)
+        for connection in connections.all():
+            connection.close()
+
+        with override_settings(ALLOWED_HOSTS=[HOST]):
+            user = self.get_user(options['user'])
+            sessions = self.sign_in(user, options['concurrency'])
+            try:
+                requests = self.build_requests(user)
+                if mode == 'wsgi':
+                    stats, seconds = self.drive_wsgi(requests, sessions, options)
+                else:
+                    stats, seconds = self.drive_asgi(requests, sessions, options)
+            finally:
+                for session_key, _ in sessions:
+                    self.session_store(session_key).delete()
+
+        latencies = sorted(stats.latencies)
+        result = {f'p{p}_ms': round(percentile(latencies, p) * 1000, 2) for p in PERCENTILES}
+        result.update({
+            'throughput': round(len(latencies) / seconds, 1),
+            'seconds': round(seconds, 2),
+            'peak_in_flight': stats.peak_in_flight,
+            'statuses': stats.statuses,
+            'errors': stats.errors[:5],
+        })
+        return result
+
+    def get_user(self, username):
+        users = User.objects.filter(is_active=True)
+        if username:
+            user = users.filter(username=username).first()
+        else:
+            user = users.filter(is_staff=False).order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to sign in as; generate a dataset first or pass --user.')
+        return user
+
+    @staticmethod
+    def session_store(session_key):
+        return import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+
+    def sign_in(self, user, count):
+        """One (session key, CSRF token) per client."""
+        sessions = []
+        for _ in range(count):
+            client = Client()
+            client.force_login(user)
+            sessions.append((client.cookies[settings.SESSION_COOKIE_NAME].value, secrets.token_hex(16)))
+        return sessions
+
+    def build_requests(self, user):
+        """request(i, session) makes the i-th request of one view, for each view in the mix."""
+        notes = list(
+            Note.objects.filter(is_public=True).exclude(uploader=user)
+            .order_by('-total_ratings', 'pk').values_list('pk', flat=True)[:50]
+        )
+        if not notes:
+            raise CommandError('No public notes from other users to benchmark with; generate a dataset first.')
+        votes = list(
+            Rating.objects.filter(user=user, note__is_public=True).exclude(note__uploader=user)
+            .order_by('note_id').values_list('note_id', 'value')[:50]
+        )
+        list_params = [{}, {'sort': '-average_rating'}, {'sort': 'title'}]
+
+        def cookies(session):
+            session_key, csrf_token = session
+            return {settings.SESSION_COOKIE_NAME: session_key, settings.CSRF_COOKIE_NAME: csrf_token}
+
+        requests = [
+            lambda i, session: BenchRequest(
+                'GET', reverse('notes:note-list'), list_params[i % len(list_params)], cookies=cookies(session),
+            ),
+            lambda i, session: BenchRequest(
+                'GET', reverse('notes:note-search'), {'q': DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)]},
+                cookies=cookies(session),
+            ),
+            lambda i, session: BenchRequest(
+                'GET', reverse('notes:note-detail', args=[notes[i % len(notes)]]), cookies=cookies(session),
+            ),
+        ]
+        if votes:
+            requests.append(lambda i, session: BenchRequest(
+                'POST', reverse('notes:note-rate', args=[votes[i % len(votes)][0]]),
+                data={'rating': votes[i % len(votes)][1]}, cookies=cookies(session), csrf_token=session[1],
+            ))
+        else:
+            self.stderr.write('The user has no votes to re-submit; leaving the rating view out.')
+        return requests
+
+    def schedule(self, requests, sessions, options):
+        """The requests to send: warmup first, then the measured ones, spread over the clients."""
+        warmup = [request(i, sessions[0]) for request in requests for i in range(options['warmup'])]
+        measured = [[] for _ in sessions]
+        for i in range(options['requests']):
+            client = i % len(sessions)
+            measured[client].append(requests[i % len(requests)](i, sessions[client]))
+        return warmup, measured
+
+    def drive_wsgi(self, requests, sessions, options):
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+        stats = Stats()
+
+        def call(request):
+            status = []
+            response = application(request.environ(), lambda line, headers, exc_info=None: status.append(line))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+            return int(status[0].split()[0])
+
+        warmup, measured = self.schedule(requests, sessions, options)
+        for request in warmup:
+            call(request)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            def serve(request):
+                stats.entered()
+                try:
+                    return call(request)
+                finally:
+                    stats.left()
+
+            def client(queue):
+                for request in queue:
+                    started = time.perf_counter()
+                    try:
+                        status = pool.submit(serve, request).result()
+                    except Exception as exc:
+                        stats.record(time.perf_counter() - started, error=repr(exc))
+                    else:
+                        stats.record(time.perf_counter() - started, status)
+
+            started = time.perf_counter()
+            clients = [threading.Thread(target=client, args=(queue,)) for queue in measured]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+            return stats, time.perf_counter() - started
+
+    def drive_asgi(self, requests, sessions, options):
+        from django.core.asgi import get_asgi_application
+        application = get_asgi_application()
+        stats = Stats()
+
+        async def call(request):
+            body_sent = False
+            disconnected = asyncio.Event()
+            status = []
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': request.body, 'more_body': False}
+                # The client stays connected; Django stops listening once it has answered
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            await application(request.scope(), receive, send)
+            return status[0]
+
+        async def client(queue):
+            for request in queue:
+                started = time.perf_counter()
+                stats.entered()
+                try:
+                    status = await call(request)
+                except Exception as exc:
+                    stats.record(time.perf_counter() - started, error=repr(exc))
+                else:
+                    stats.record(time.perf_counter() - started, status)
+                finally:
+                    stats.left()
+
+        async def worker(queues):
+            await asyncio.gather(*(client(queue) for queue in queues))
+
+        async def warm(warmup):
+            for request in warmup:
+                await call(request)
+
+        warmup, measured = self.schedule(requests, sessions, options)
+        asyncio.run(warm(warmup))
+
+        # Each event loop, like a uvicorn worker, takes an equal share of the clients
+        workers = options['workers']
+        started = time.perf_counter()
+        loops = [
+            threading.Thread(target=asyncio.run, args=(worker(measured[index::workers]),))
+            for index in range(workers)
+        ]
+        for thread in loops:
+            thread.start()
+        for thread in loops:
+            thread.join()
+        return stats, time.perf_counter() - started
@@ -0,0 +1,242 @@
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from categories.models import Category
+from core.models import User
+from notes.models import Note, Rating
+
+# ---
+# VIEW BENCHMARK
+# ---
+# Drives the main views in-process with the test client against whatever
+# data is in the database (see `manage.py generate_dataset`) and records,
+# per view: latency percentiles, SQL queries and rows fetched per request.
+# Everything runs inside one transaction that is rolled back at the end,
+# so the rating POSTs (and the login session) leave nothing behind.
+#
+# Caches are left as they are and warmed by the first requests, so the
+# numbers are steady-state ones. Latency depends on the machine: compare
+# against a baseline recorded on the same one.
+
+DEFAULT_QUERIES = ['algebra', 'physics', 'introduction', 'history notes', 'calculus derivatives']
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class QueryMeter:
+    """execute_wrapper that counts queries and the rows SELECTs return."""
+
+    def __init__(self):
+        self.queries = self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        rowcount = context['cursor'].rowcount
+        if rowcount and rowcount > 0 and sql.lstrip()[:6].upper() == 'SELECT':
+            self.rows += rowcount
+        return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the note list/search/detail, rating, category list and dashboard views: '
+        'p50/p95/p99 latency, SQL queries and rows per request. Writes JSON and compares it with a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Measured requests per view (default: 50).')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Unmeasured requests per view first, to warm caches (default: 5).')
+        parser.add_argument('--user', help='Username to log in as (default: the first active non-staff user).')
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Search term to cycle through; repeat for more (default: a fixed set).')
+        parser.add_argument('--view', action='append', dest='views',
+                            help='Only run this view (by name, see the output); repeatable.')
+        parser.add_argument('--output', default='benchmarks/results.json',
+                            help='Where to write the results (default: benchmarks/results.json).')
+        parser.add_argument('--baseline', default='benchmarks/baseline.json',
+                            help='Results to compare with (default: benchmarks/baseline.json).')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results to the baseline file instead of comparing.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative increase in p95 latency and rows (default: 0.2 = 20%%).')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+
+        user = self.get_user(options['user'])
+        scenarios = self.build_scenarios(user, options['queries'] or DEFAULT_QUERIES)
+        if options['views']:
+            unknown = set(options['views']) - {name for name, _ in scenarios}
+            if unknown:
+                raise CommandError(f'Unknown view(s): {", ".join(sorted(unknown))}')
+            scenarios = [(name, request) for name, request in scenarios if name in options['views']]
+
+        # The test client talks to the app in-process; HTTPS so a production
+        # SECURE_SSL_REDIRECT doesn't turn every request into a redirect
+        client = Client(secure=True)
+        meter = QueryMeter()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            client.force_login(user)
+            with ExitStack() as stack:
+                # Every database, read replicas included
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(meter))
+                for name, request in scenarios:
+                    results[name] = self.run(client, meter, request, options['warmup'], options['requests'])
+                    self.report(name, results[name])
+            transaction.set_rollback(True)
+
+        output = {
+            'created_at': timezone.now().isoformat(),
+            'machine': platform.node(),
+            'python': platform.python_version(),
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'dataset': {
+                'users': User.objects.count(),
+                'notes': Note.objects.count(),
+                'ratings': Rating.objects.count(),
+                'categories': Category.objects.count(),
+            },
+            'views': results,
+        }
+        if options['save_baseline']:
+            self.write(options['baseline'], output)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {options["baseline"]}.'))
+            return
+
+        self.write(options['output'], output)
+        self.stdout.write(f'Results written to {options["output"]}.')
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(
+                f'No baseline at {options["baseline"]}; record one with --save-baseline.'
+            ))
+            return
+        with open(options['baseline']) as fh:
+            baseline = json.load(fh)
+        regressions = self.compare(baseline['views'], results, options['threshold'])
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}.')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def get_user(self, username):
+        users = User.objects.filter(is_active=True)
+        if username:
+            user = users.filter(username=username).first()
+        else:
+            user = users.filter(is_staff=False).order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to log in as; generate a dataset first or pass --user.')
+        return user
+
+    def build_scenarios(self, user, queries):
+        """(name, request) pairs; request(i) makes the i-th request of that view and returns the response."""
+        notes = list(
+            Note.objects.filter(is_public=True).exclude(uploader=user)
+            .order_by('-total_ratings', 'pk').values_list('pk', flat=True)[:50]
+        )
+        if not notes:
+            raise CommandError('No public notes from other users to benchmark with; generate a dataset first.')
+        category_ids = list(Category.objects.order_by('-note_count', 'pk').values_list('pk', flat=True)[:5])
+        list_params = [{}, {'sort': '-average_rating'}, {'sort': 'title'}] + [{'category': pk} for pk in category_ids]
+
+        def get(url, params=None):
+            return lambda client, i: client.get(url, params(i) if params else None)
+
+        return [
+            ('note-list', get(reverse('notes:note-list'), lambda i: list_params[i % len(list_params)])),
+            ('note-search', get(reverse('notes:note-search'), lambda i: {'q': queries[i % len(queries)]})),
+            ('note-detail', lambda client, i: client.get(reverse('notes:note-detail', args=[notes[i % len(notes)]]))),
+            ('note-rate', lambda client, i: client.post(
+                reverse('notes:note-rate', args=[notes[i % len(notes)]]), {'rating': i % 5 + 1},
+            )),
+            ('category-list', get(reverse('categories:category-list'))),
+            ('dashboard', get(reverse('dashboard'))),
+        ]
+
+    def run(self, client, meter, request, warmup, count):
+        for i in range(warmup):
+            request(client, i)
+
+        latencies, queries, rows, statuses = [], [], [], set()
+        for i in range(warmup, warmup + count):
+            meter.queries = meter.rows = 0
+            started = time.perf_counter()
+            response = request(client, i)
+            # Streaming responses are only produced when read
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(meter.queries)
+            rows.append(meter.rows)
+            statuses.add(response.status_code)
+
+        latencies.sort()
+        result = {f'p{p}_ms': round(percentile(latencies, p), 2) for p in PERCENTILES}
+        result.update({
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'queries': statistics.median_high(queries),
+            'max_queries': max(queries),
+            'rows': statistics.median_high(rows),
+            'status_codes': sorted(statuses),
+        })
+        return result
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<15} p50 {result["p50_ms"]:8.2f}ms  p95 {result["p95_ms"]:8.2f}ms  '
+            f'p99 {result["p99_ms"]:8.2f}ms  {result["queries"]:3d} queries  {result["rows"]:5d} rows  '
+            f'status {",".join(map(str, result["status_codes"]))}'
+        )
+
+    @staticmethod
+    def compare(baseline, results, threshold):
+        """Lines describing every view that got slower or heavier than the baseline allows."""
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+                regressions.append(f'{name}: p95 {result["p95_ms"]}ms, baseline {before["p95_ms"]}ms')
+            # Query counts are deterministic, so any increase is a regression
+            if result['queries'] > before['queries']:
+                regressions.append(f'{name}: {result["queries"]} queries, baseline {before["queries"]}')
+            if result['rows'] > before['rows'] * (1 + threshold):
+                regressions.append(f'{name}: {result["rows"]} rows, baseline {before["rows"]}')
+            if result['status_codes'] != before['status_codes']:
+                regressions.append(f'{name}: status {result["status_codes"]}, baseline {before["status_codes"]}')
+        return regressions
+
+    @staticmethod
+    def write(path, data):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as fh:
+            json.dump(data, fh, indent=2)
+            fh.write('\n')
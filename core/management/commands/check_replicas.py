@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dbrouter import replica_lag
+
+
+class Command(BaseCommand):
+    help = 'Shows whether each read replica (DATABASE_REPLICAS) is reachable and how far it lags behind the primary.'
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            self.stdout.write('No read replicas configured (DATABASE_REPLICAS); all reads use the primary.')
+            return
+
+        unusable = 0
+        for alias in settings.REPLICA_DATABASES:
+            database = settings.DATABASES[alias]
+            where = f"{database['HOST'] or 'localhost'}:{database['PORT'] or 5432}/{database['NAME']}"
+            lag = replica_lag(alias)
+            if lag is None:
+                unusable += 1
+                self.stdout.write(self.style.ERROR(f'{alias} ({where}): unreachable, reads go to the primary'))
+            elif lag > settings.REPLICA_MAX_LAG:
+                unusable += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{alias} ({where}): {lag:.1f}s behind, over REPLICA_MAX_LAG={settings.REPLICA_MAX_LAG}s; skipped'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{alias} ({where}): {lag:.1f}s behind, in use'))
+
+        if unusable:
+            raise CommandError(f'{unusable} of {len(settings.REPLICA_DATABASES)} replica(s) not usable.')
@@ -0,0 +1,362 @@
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from categories.models import Category
+from categories.tree import invalidate_category_tree
+from core.dashboard import invalidate_dashboard_snapshot
+from core.models import User, ReputationEvent
+from notes.models import FileBlob, Note, Rating, Tag
+from notes.storage import note_file_storage
+from notes.tags import invalidate_tag_cache
+
+# ---
+# SYNTHETIC DATASET
+# ---
+# Everything is drawn from one random.Random(seed), so the same arguments
+# always give the same rows and the same file bytes. Nothing is fetched
+# from the network: the file payloads are small PDFs written here.
+#
+# Rows go in with bulk_create, so no model signals fire. The derived data
+# those signals would keep (rating aggregates, reputation, tag and category
+# counters, blob refcounts, search vectors) is computed set-wise at the end.
+
+WORDS = (
+    'algebra calculus geometry statistics probability physics chemistry biology genetics ecology '
+    'economics history geography literature grammar poetry philosophy ethics logic psychology '
+    'sociology anatomy physiology botany zoology astronomy geology mechanics optics thermodynamics '
+    'electricity magnetism circuits algorithms databases networks compilers security graphics '
+    'robotics accounting marketing finance management law politics linguistics music drawing '
+    'vectors matrices functions limits derivatives integrals series sequences proofs sets '
+    'graphs trees sorting recursion cells atoms molecules reactions energy waves forces motion '
+    'revolution empire climate rivers markets trade language essays novels sonnets theory practice'
+).split()
+
+TOPIC_PHRASES = ('Introduction to', 'Notes on', 'Revision:', 'Lecture on', 'Summary of', 'Exercises in')
+
+# Standard deviation of the stars a note gets around its "true" quality
+RATING_SPREAD = 1.0
+
+USERNAME_PREFIX = 'gen'
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """Lets bulk_create keep the created_at values set on the objects."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def make_pdf(lines):
+    """A minimal single-page PDF showing `lines` of Helvetica text. Byte-for-byte deterministic."""
+    def escape(text):
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    content = 'BT /F1 12 Tf 72 720 Td 16 TL ' + ' '.join(f'({escape(line)}) Tj T*' for line in lines) + ' ET'
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        '/Resources << /Font << /F1 5 0 R >> >> >>',
+        f'<< /Length {len(content)} >>\nstream\n{content}\nendstream',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    out = '%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    return out.encode('latin-1')
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a large, deterministic synthetic dataset (users, categories, tags, notes, ratings) '
+        'for load testing, without network access. Adds to the existing data; use a fresh database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--notes', type=int, default=2000)
+        parser.add_argument('--tags', type=int, default=300)
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--depth', type=int, default=3,
+                            help='Maximum category depth; 1 means only top-level categories (default: 3).')
+        parser.add_argument('--ratings', type=int, default=20000,
+                            help='Approximate number of ratings, spread unevenly over the notes (default: 20000).')
+        parser.add_argument('--files', type=int, default=50,
+                            help='Number of distinct file payloads the notes share (default: 50).')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per bulk INSERT (default: 5000).')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'notes', 'categories', 'depth', 'files', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be at least 1.')
+        if options['users'] < 2 and options['ratings']:
+            raise CommandError('Ratings need at least two users (nobody rates their own note).')
+
+        self.seed = options['seed']
+        self.rng = random.Random(self.seed)
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.prefix = f'{USERNAME_PREFIX}{self.seed}_'
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(f'A dataset with seed {self.seed} already exists; pick another --seed.')
+
+        started = time.monotonic()
+        user_ids = self.create_users(options['users'])
+        category_ids = self.create_categories(options['categories'], options['depth'])
+        tag_ids = self.create_tags(options['tags'])
+        files = self.create_files(options['files'])
+        note_ids = self.create_notes(options['notes'], user_ids, category_ids, tag_ids, files)
+        self.create_ratings(options['ratings'], note_ids, user_ids)
+        self.rebuild_derived_data(note_ids, user_ids, files)
+        self.stdout.write(self.style.SUCCESS(f'Dataset generated in {time.monotonic() - started:.1f}s.'))
+
+    def timestamp(self, max_age_days=365):
+        return self.now - timedelta(seconds=self.rng.randrange(max_age_days * 24 * 60 * 60))
+
+    def insert(self, model, objects):
+        """bulk_create in batches; returns the created objects (with pks on PostgreSQL)."""
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                created += model.objects.bulk_create(objects[start:start + self.batch_size])
+        return created
+
+    # --- 1. Users ---
+    def create_users(self, count):
+        self.stdout.write(f'Creating {count} users...')
+        # Hashing is deliberately slow, so every user shares one hash ("password")
+        password = make_password('password')
+        users = []
+        for i in range(count):
+            first, last = self.rng.choice(WORDS).title(), self.rng.choice(WORDS).title()
+            users.append(User(
+                username=f'{self.prefix}{i}',
+                email=f'{self.prefix}{i}@example.com',
+                password=password,
+                first_name=first,
+                last_name=last,
+                role='teacher' if self.rng.random() < 0.1 else 'student',
+                date_joined=self.timestamp(),
+            ))
+        return [user.pk for user in self.insert(User, users)]
+
+    # --- 2. Categories, level by level so parents have pks ---
+    def create_categories(self, count, max_depth):
+        self.stdout.write(f'Creating {count} categories (depth up to {max_depth})...')
+        # Shape first: each category hangs under a random earlier one that still has room below it
+        parents, depths, open_parents = [], [], []
+        for i in range(count):
+            parent = self.rng.choice(open_parents) if open_parents and self.rng.random() < 0.7 else None
+            parents.append(parent)
+            depths.append(0 if parent is None else depths[parent] + 1)
+            if depths[i] < max_depth - 1:
+                open_parents.append(i)
+
+        names = [f'{self.rng.choice(WORDS).title()} {self.rng.choice(WORDS).title()} {self.seed}-{i}'
+                 for i in range(count)]
+        if Category.objects.filter(name__in=names).exists():
+            raise CommandError('Generated category names already exist; pick another --seed.')
+
+        pks, paths = [None] * count, [None] * count
+        for level in range(max_depth):
+            indexes = [i for i in range(count) if depths[i] == level]
+            if not indexes:
+                break
+            created = self.insert(Category, [
+                Category(
+                    name=names[i],
+                    description=f'Generated category {names[i]}.',
+                    parent_id=pks[parents[i]] if parents[i] is not None else None,
+                    depth=level,
+                )
+                for i in indexes
+            ])
+            for i, category in zip(indexes, created):
+                pks[i] = category.pk
+                paths[i] = (paths[parents[i]] if parents[i] is not None else '/') + f'{category.pk}/'
+                category.path = paths[i]
+            Category.objects.bulk_update(created, ['path'], batch_size=self.batch_size)
+        return pks
+
+    # --- 3. Tags ---
+    def create_tags(self, count):
+        self.stdout.write(f'Creating {count} tags...')
+        names = [f'{self.rng.choice(WORDS)}-{self.seed}-{i}' for i in range(count)]
+        if Tag.objects.filter(name__in=names).exists():
+            raise CommandError('Generated tag names already exist; pick another --seed.')
+        return [tag.pk for tag in self.insert(Tag, [Tag(name=name, slug=name) for name in names])]
+
+    # --- 4. File payloads, stored once each in the content-addressed storage ---
+    def create_files(self, count):
+        self.stdout.write(f'Writing {count} file payloads...')
+        files = []
+        for i in range(count):
+            lines = [f'{self.rng.choice(TOPIC_PHRASES)} {self.rng.choice(WORDS)} ({self.seed}-{i})']
+            lines += [' '.join(self.rng.choice(WORDS) for _ in range(12)) for _ in range(self.rng.randint(5, 30))]
+            payload = make_pdf(lines)
+            # save() takes one FileBlob reference; the real counts are set at the end
+            name = note_file_storage.save(f'notes/generated-{i}.pdf', ContentFile(payload))
+            files.append((name, hashlib.sha256(payload).hexdigest(), '\n'.join(lines)))
+        return files
+
+    # --- 5. Notes and their tags ---
+    def create_notes(self, count, user_ids, category_ids, tag_ids, files):
+        self.stdout.write(f'Creating {count} notes...')
+        # A few prolific uploaders and popular tags, like real data
+        uploader_weights = [self.rng.paretovariate(1.2) for _ in user_ids]
+        tag_weights = [self.rng.paretovariate(1.0) for _ in tag_ids]
+        through = Note.tags.through
+
+        note_ids = []
+        created_at = Note._meta.get_field('created_at')
+        for start in range(0, count, self.batch_size):
+            notes = []
+            for i in range(start, min(start + self.batch_size, count)):
+                name, sha256, text = self.rng.choice(files)
+                words = self.rng.sample(WORDS, 3)
+                notes.append(Note(
+                    title=f'{self.rng.choice(TOPIC_PHRASES)} {" ".join(words).title()} #{i}',
+                    description=' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(10, 60))),
+                    file=name,
+                    file_sha256=sha256,
+                    # The text is known, so there is nothing to extract
+                    content_text=text,
+                    content_sha256=sha256,
+                    uploader_id=self.rng.choices(user_ids, uploader_weights)[0],
+                    category_id=self.rng.choice(category_ids) if self.rng.random() < 0.95 else None,
+                    is_public=self.rng.random() < 0.9,
+                    created_at=self.timestamp(),
+                ))
+            with transaction.atomic(), manual_timestamps(created_at):
+                notes = Note.objects.bulk_create(notes)
+                links = []
+                for note in notes:
+                    if tag_ids:
+                        chosen = set(self.rng.choices(tag_ids, tag_weights, k=self.rng.randint(1, 5)))
+                        links += [through(note_id=note.pk, tag_id=tag_id) for tag_id in sorted(chosen)]
+                through.objects.bulk_create(links)
+            note_ids += [note.pk for note in notes]
+            self.stdout.write(f'...{len(note_ids)} notes')
+        return note_ids
+
+    # --- 6. Ratings ---
+    def create_ratings(self, count, note_ids, user_ids):
+        if not count:
+            return
+        self.stdout.write(f'Creating about {count} ratings...')
+        uploaders = dict(Note.objects.filter(pk__in=note_ids).values_list('pk', 'uploader_id'))
+        weights = [self.rng.paretovariate(1.5) for _ in note_ids]
+        scale = count / sum(weights)
+        max_raters = len(user_ids) - 1
+
+        created_at = Rating._meta.get_field('created_at')
+        batch, total = [], 0
+        for note_id, weight in zip(note_ids, weights):
+            raters = min(max_raters, round(weight * scale))
+            if not raters:
+                continue
+            quality = self.rng.uniform(1, 5)
+            # One extra draw so the uploader can be dropped
+            for user_id in [pk for pk in self.rng.sample(user_ids, raters + 1) if pk != uploaders[note_id]][:raters]:
+                value = min(5, max(1, round(self.rng.gauss(quality, RATING_SPREAD))))
+                batch.append(Rating(note_id=note_id, user_id=user_id, value=value, created_at=self.timestamp()))
+            if len(batch) >= self.batch_size:
+                with transaction.atomic(), manual_timestamps(created_at):
+                    Rating.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+                self.stdout.write(f'...{total} ratings')
+        if batch:
+            with transaction.atomic(), manual_timestamps(created_at):
+                Rating.objects.bulk_create(batch)
+            total += len(batch)
+        self.stdout.write(f'...{total} ratings')
+
+    # --- 7. Everything derived, set-wise ---
+    def rebuild_derived_data(self, note_ids, user_ids, files):
+        self.stdout.write('Computing rating aggregates...')
+        notes = Note.objects.filter(pk__gte=min(note_ids), pk__lte=max(note_ids))
+
+        def per_note(aggregate):
+            return Coalesce(
+                Subquery(
+                    Rating.objects.filter(note=OuterRef('pk')).order_by()
+                    .values('note').annotate(result=aggregate).values('result'),
+                    output_field=IntegerField(),
+                ),
+                0,
+            )
+
+        notes.update(
+            rating_sum=per_note(Sum('value')),
+            total_ratings=per_note(Count('id')),
+            **{f'rating_count_{i}': per_note(Count('id', filter=Q(value=i))) for i in range(1, 6)}
+        )
+        notes.update(average_rating=Coalesce(
+            Cast(F('rating_sum'), FloatField()) / NullIf(F('total_ratings'), Value(0)), Value(0.0),
+        ))
+
+        # One opening-balance ledger event per user, worth what the seeded
+        # uploads and ratings would have earned (see Rating.reputation_for)
+        self.stdout.write('Computing reputation...')
+        earned = dict.fromkeys(user_ids, 0)
+        uploads = notes.order_by().values('uploader').annotate(n=Count('id')).values_list('uploader', 'n')
+        for user_id, n in uploads:
+            earned[user_id] += 10 * n
+        rating_reputation = Case(When(value__gte=4, then=Value(5)), When(value__lte=2, then=Value(-2)), default=Value(0))
+        from_ratings = (
+            Rating.objects.filter(note__in=notes).order_by().values('note__uploader')
+            .annotate(total=Sum(rating_reputation)).values_list('note__uploader', 'total')
+        )
+        for user_id, total in from_ratings:
+            earned[user_id] += total
+        self.insert(ReputationEvent, [
+            ReputationEvent(user_id=user_id, delta=delta, reason=ReputationEvent.OPENING_BALANCE)
+            for user_id, delta in earned.items() if delta
+        ])
+        call_command('rollup_reputation', stdout=self.stdout)
+
+        self.stdout.write('Recounting tags, categories and file references...')
+        call_command('recount_tag_usage', stdout=self.stdout)
+        call_command('reconcile_category_counts', stdout=self.stdout)
+        references = Coalesce(
+            Subquery(
+                Note.objects.filter(file=OuterRef('name')).order_by()
+                .values('file').annotate(n=Count('id')).values('n'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+        FileBlob.objects.filter(name__in=[name for name, _, _ in files]).update(refcount=references)
+
+        self.stdout.write('Building search vectors...')
+        call_command('rebuild_search_vectors', only_missing=True, batch_size=self.batch_size, stdout=self.stdout)
+
+        invalidate_category_tree()
+        invalidate_tag_cache()
+        invalidate_dashboard_snapshot()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import User, ReputationEvent
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or, with --check, verifies) every user\'s reputation from the ReputationEvent ledger.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report users whose balance differs from the ledger; exit non-zero on drift.')
+
+    def handle(self, *args, **options):
+        ledger_balance = Coalesce(
+            Subquery(
+                ReputationEvent.objects.filter(user=OuterRef('pk')).order_by()
+                .values('user').annotate(total=Sum('delta')).values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+        if options['check']:
+            drifted = (
+                User.objects.annotate(ledger=ledger_balance)
+                .exclude(reputation=F('ledger'))
+                .values_list('username', 'reputation', 'ledger')
+            )
+            count = 0
+            for username, reputation, ledger in drifted:
+                count += 1
+                self.stdout.write(f'{username}: balance {reputation}, ledger {ledger}')
+            if count:
+                raise CommandError(f'{count} user(s) out of sync with the reputation ledger.')
+            self.stdout.write(self.style.SUCCESS('All reputation balances match the ledger.'))
+            return
+
+        # One set-based UPDATE over the users table
+        updated = User.objects.exclude(reputation=ledger_balance).update(reputation=ledger_balance)
+        self.stdout.write(self.style.SUCCESS(f'Reputation rebuilt from the ledger ({updated} user(s) corrected).'))
@@ -0,0 +1,93 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.queue import claim, purge_finished, requeue_stale, run_job
+
+logger = logging.getLogger(__name__)
+
+STALE_CHECK_INTERVAL = 60  # seconds
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs from the database queue (see core/queue.py) until stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Number of worker threads, each with its own DB connection (default: 1).')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due instead of waiting for more (e.g. from cron).')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        self.once = options['once']
+        self.stop = threading.Event()
+        self.done = self.failed = 0
+        self.counter_lock = threading.Lock()
+
+        # Finish the jobs in hand on Ctrl+C / SIGTERM, then exit
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop.set())
+
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        threads = [
+            threading.Thread(target=self.work, args=(f'{prefix}:{n}',), name=f'job-worker-{n}')
+            for n in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'{concurrency} worker(s) started. Press Ctrl+C to stop.')
+
+        # The main thread recovers jobs whose worker process died and
+        # clears out old finished ones
+        last_check = None
+        while any(thread.is_alive() for thread in threads):
+            if last_check is None or time.monotonic() - last_check >= STALE_CHECK_INTERVAL:
+                requeued, dead = requeue_stale()
+                if requeued or dead:
+                    logger.warning('Recovered stale jobs: %s requeued, %s dead', requeued, dead)
+                purge_finished()
+                connection.close()
+                last_check = time.monotonic()
+            for thread in threads:
+                thread.join(timeout=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Workers stopped: {self.done} job(s) done, {self.failed} failed.'))
+
+    def work(self, worker_id):
+        try:
+            while not self.stop.is_set():
+                try:
+                    job = claim(worker_id)
+                except Exception:
+                    logger.exception('Claiming a job failed')
+                    connection.close()  # reconnect on the next attempt
+                    self.stop.wait(settings.JOB_QUEUE_POLL_INTERVAL)
+                    continue
+
+                if job is None:
+                    if self.once:
+                        break
+                    self.stop.wait(settings.JOB_QUEUE_POLL_INTERVAL)
+                    continue
+
+                started = time.monotonic()
+                ok = run_job(job)
+                with self.counter_lock:
+                    if ok:
+                        self.done += 1
+                    else:
+                        self.failed += 1
+                logger.info('Job %s (%s) %s in %.3fs', job.pk, job.name, 'done' if ok else 'failed',
+                            time.monotonic() - started)
+        finally:
+            connection.close()
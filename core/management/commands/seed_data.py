@@ -9,9 +9,10 @@ from faker import Faker
 from docx import Document
 from pptx import Presentation
 
-from core.models import User
+from core.models import User, ReputationEvent
 from categories.models import Category
 from notes.models import Note, Tag, Rating
+from notes.storage import blob_sha256
 
 class Command(BaseCommand):
     help = 'Seeds the database with 50 notes (PDF, DOCX, PPTX) and other dummy data.'
@@ -35,8 +36,8 @@ class Command(BaseCommand):
             admin_user = User.objects.get(is_superuser=True)
             admin_user.first_name = "Admin"
             admin_user.last_name = "User"
-            admin_user.reputation = 999
-            admin_user.save()
+            admin_user.save(update_fields=['first_name', 'last_name'])
+            ReputationEvent.objects.record(admin_user, 999 - admin_user.reputation, ReputationEvent.ADJUSTMENT)
         except User.DoesNotExist:
             self.stdout.write(self.style.ERROR('Superuser not found! Please create one first with `python manage.py createsuperuser`'))
             return
@@ -121,13 +122,15 @@ class Command(BaseCommand):
                 # 1. Reset the file pointer
                 dummy_file.seek(0)
                 # 2. Save using the *original* ContentFile object, not a new copy
-                note.file.save(f"dummy_note_{i+1}.{file_type}", dummy_file, save=True)
+                # Identical payloads are stored once (content-addressed storage)
+                note.file.save(f"dummy_note_{i+1}.{file_type}", dummy_file, save=False)
+                note.file_sha256 = blob_sha256(note.file.name) or ''
+                note.save(update_fields=['file', 'file_sha256'])
             # --- END FIX ---
 
             note.tags.set(random.sample(tags, random.randint(1, 3)))
             
-            uploader.reputation += 10
-            uploader.save()
+            ReputationEvent.objects.record(uploader, 10, ReputationEvent.NOTE_UPLOADED, note=note)
             all_notes.append(note)
 
         # 6. Create Ratings
@@ -141,13 +144,12 @@ class Command(BaseCommand):
                     continue
                 
                 rating_value = random.randint(1, 5)
-                Rating.objects.create(note=note, user=rater, value=rating_value)
+                rating = Rating.objects.create(note=note, user=rater, value=rating_value)
                 
-                if rating_value >= 4:
-                    note.uploader.reputation += 5 
-                elif rating_value <= 2:
-                    note.uploader.reputation -= 2
-                note.uploader.save()
+                ReputationEvent.objects.record(
+                    note.uploader, Rating.reputation_for(rating_value), ReputationEvent.NOTE_RATED,
+                    note=note, rating=rating
+                )
             
             note.update_rating()
 
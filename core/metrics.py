@@ -0,0 +1,160 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+# ---
+# REQUEST METRICS
+# ---
+# core.middleware.RequestMetricsMiddleware records, for every request, the
+# total latency, the time spent in SQL and the number of queries, labelled
+# with the resolved URL name ("notes:note-list", "dashboard", ...). They
+# are kept as fixed-bucket histograms in this process and rendered in the
+# Prometheus text format by /metrics/.
+#
+# With several worker processes (gunicorn), each one writes a snapshot of
+# its histograms to METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL
+# seconds; /metrics/ adds up all the snapshots, so whichever worker answers
+# the scrape reports the whole server. Snapshots of exited workers are kept
+# (their requests still happened), so clear METRICS_DIR when deploying.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'edushare_request_duration_seconds': ('Time to produce the response, per view.', LATENCY_BUCKETS),
+    'edushare_request_db_seconds': ('Time spent running SQL queries per request, per view.', LATENCY_BUCKETS),
+    'edushare_request_queries': ('SQL queries run per request, per view.', QUERY_BUCKETS),
+}
+REQUESTS_TOTAL = 'edushare_requests_total'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+# {metric: {view: [count per bucket..., sum, count]}}, buckets not cumulative
+_histograms = {name: {} for name in HISTOGRAMS}
+# {"view status": count}
+_requests = {}
+_last_flush = 0.0
+
+
+def record(view, status, duration, db_time, queries):
+    """Adds one request to this process's histograms."""
+    values = {
+        'edushare_request_duration_seconds': duration,
+        'edushare_request_db_seconds': db_time,
+        'edushare_request_queries': queries,
+    }
+    with _lock:
+        for name, value in values.items():
+            buckets = HISTOGRAMS[name][1]
+            series = _histograms[name].setdefault(view, [0] * len(buckets) + [0, 0])
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+        key = f'{view} {status}'
+        _requests[key] = _requests.get(key, 0) + 1
+    _maybe_flush()
+
+
+def snapshot():
+    with _lock:
+        return {
+            'histograms': {name: {view: list(series) for view, series in views.items()}
+                           for name, views in _histograms.items()},
+            'requests': dict(_requests),
+        }
+
+
+def _snapshot_path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+def _maybe_flush():
+    global _last_flush
+    if not settings.METRICS_DIR or time.monotonic() - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = time.monotonic()
+    flush()
+
+
+def flush():
+    """Writes this process's snapshot to METRICS_DIR (atomically, readers never see half a file)."""
+    if not settings.METRICS_DIR:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(snapshot(), fh)
+    os.replace(tmp_path, path)
+
+
+atexit.register(flush)
+
+
+def collect():
+    """This process's live data plus every other process's last snapshot."""
+    merged = snapshot()
+    if not settings.METRICS_DIR or not os.path.isdir(settings.METRICS_DIR):
+        return merged
+    own = f'{os.getpid()}.json'
+    for filename in os.listdir(settings.METRICS_DIR):
+        if not filename.endswith('.json') or filename == own:
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, filename)) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for name, views in data.get('histograms', {}).items():
+            if name not in merged['histograms']:
+                continue
+            for view, series in views.items():
+                current = merged['histograms'][name].get(view)
+                if current is None:
+                    merged['histograms'][name][view] = series
+                elif len(current) == len(series):  # skip snapshots from a different bucket layout
+                    merged['histograms'][name][view] = [a + b for a, b in zip(current, series)]
+        for key, count in data.get('requests', {}).items():
+            merged['requests'][key] = merged['requests'].get(key, 0) + count
+    return merged
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    data = collect()
+    lines = [
+        f'# HELP {REQUESTS_TOTAL} Requests handled, per view and status code.',
+        f'# TYPE {REQUESTS_TOTAL} counter',
+    ]
+    for key, count in sorted(data['requests'].items()):
+        view, status = key.rsplit(' ', 1)
+        lines.append(f'{REQUESTS_TOTAL}{{view="{_label(view)}",status="{status}"}} {count}')
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for view, series in sorted(data['histograms'][name].items()):
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(buckets, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{name}_sum{{view="{view}"}} {_number(series[-2])}')
+            lines.append(f'{name}_count{{view="{view}"}} {series[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,210 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import dbrouter, query_inspector
+from .metrics import record
+
+
+class HybridMiddleware:
+    """
+    Base for our middleware: runs natively under both WSGI and ASGI, so an
+    ASGI request isn't moved to a thread for the rest of the chain.
+    Subclasses implement handle(request) and ahandle(request); their
+    process_view() must not touch the database (it runs in the event loop).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            if hasattr(self, 'process_view'):
+                # Django would otherwise run a sync process_view() in a thread
+                sync_process_view = self.process_view
+
+                async def process_view(*args):
+                    return sync_process_view(*args)
+
+                self.process_view = process_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+def wrap_connections(stack, wrapper):
+    """Installs an execute_wrapper on every database connection of this thread, until `stack` closes."""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+async def awrap_connections(stack, wrapper):
+    # Under ASGI the ORM runs in the request's sync thread, which has its own connections
+    await sync_to_async(wrap_connections)(stack, wrapper)
+
+
+class QueryTimer:
+    """execute_wrapper that counts the queries run through it and adds up their time."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """
+    Records latency, SQL time and query count of every request under its
+    URL name (see core/metrics.py). Goes first in MIDDLEWARE so the time
+    spent in the other middleware (sessions, auth) is included.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            # Every configured database, not just 'default'
+            wrap_connections(stack, timer)
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def ahandle(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        stack = ExitStack()
+        await awrap_connections(stack, timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def record(self, request, response, duration, timer):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        record(view, response.status_code, duration, timer.seconds, timer.queries)
+
+
+class QueryInspectorMiddleware(HybridMiddleware):
+    """
+    Development/test check for N+1 queries and per-view query budgets,
+    see core/query_inspector.py. Removed unless QUERY_INSPECTOR is 'log' or 'raise'.
+    """
+
+    def __init__(self, get_response):
+        if settings.QUERY_INSPECTOR not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        recorder = query_inspector.QueryRecorder()
+        request.query_budget = None
+        with ExitStack() as stack:
+            wrap_connections(stack, recorder)
+            response = self.get_response(request)
+        self.report(request, recorder)
+        return response
+
+    async def ahandle(self, request):
+        recorder = query_inspector.QueryRecorder()
+        request.query_budget = None
+        stack = ExitStack()
+        await awrap_connections(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.report(request, recorder)
+        return response
+
+    def report(self, request, recorder):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        query_inspector.report(view, recorder.queries, request.query_budget)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = query_inspector.get_query_budget(view_func)
+
+
+class DatabaseRoutingMiddleware(HybridMiddleware):
+    """
+    Lets GET/HEAD requests to read-only views read from a replica, and keeps
+    clients that just wrote on the primary (see core/dbrouter.py). Removed
+    when no replicas are configured.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        state, token = dbrouter.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            dbrouter.end_request(token)
+        if state.wrote:
+            dbrouter.pin_to_primary(response)
+        return response
+
+    async def ahandle(self, request):
+        # The routing state is a context variable: the ORM's sync threads see it too
+        state, token = dbrouter.begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            dbrouter.end_request(token)
+        if state.wrote:
+            dbrouter.pin_to_primary(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = dbrouter.current_state()
+        state.replica_allowed = (
+            request.method in ('GET', 'HEAD')
+            and dbrouter.view_reads_from_replica(view_func)
+            and not dbrouter.is_pinned(request)
+        )
+
+
+class AsyncUserMiddleware(HybridMiddleware):
+    """
+    Under ASGI, loads request.user (and with it the session) up front with
+    the async API. Otherwise the lazy user would query the database from
+    the event loop the first time an async view, the page cache or a
+    template looked at it. Removed under WSGI. Goes after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not iscoroutinefunction(get_response):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    async def ahandle(self, request):
+        request.user = await request.auser()
+        return await self.get_response(request)
+
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    # Seed the ledger with each user's current balance so it sums to the same value
+    User = apps.get_model('core', 'User')
+    ReputationEvent = apps.get_model('core', 'ReputationEvent')
+    ReputationEvent.objects.bulk_create(
+        (
+            ReputationEvent(user_id=user_id, delta=reputation, reason='opening_balance')
+            for user_id, reputation in User.objects.exclude(reputation=0).values_list('pk', 'reputation').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_reputation'),
+        ('notes', '0004_note_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('note_uploaded', 'Note uploaded'), ('note_deleted', 'Note deleted'), ('note_rated', 'Note rated'), ('adjustment', 'Manual adjustment'), ('opening_balance', 'Opening balance')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('note', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='notes.note')),
+                ('rating', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='notes.rating')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reputation_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='repevent_user_created_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
@@ -19,6 +20,8 @@ class User(AbstractUser):
     
     # --- NEW: "VILLAIN ARC" FEATURE ---
     # This will be the foundation for our gamification and leaderboards
+    # Cached balance of the ReputationEvent ledger below; change it only
+    # through ReputationEvent.objects.record().
     reputation = models.IntegerField(default=0)
     # --- END NEW FEATURE ---
     
@@ -51,4 +54,118 @@ class User(AbstractUser):
             return today.year - self.date_of_birth.year - (
                 (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day)
             )
-        return None
\ No newline at end of file
+        return None
+
+
+# ---
+# REPUTATION LEDGER
+# ---
+class ReputationEventManager(models.Manager):
+    def record(self, user, delta, reason, note=None, rating=None):
+        """
+        Appends a ledger event and applies it to the user's cached balance
+        with an atomic F() increment (no read-modify-write of the user row).
+        Zero deltas are not recorded. Returns the event, or None.
+        """
+        if not delta:
+            return None
+        with transaction.atomic():
+            event = self.create(user_id=user.pk, delta=delta, reason=reason, note=note, rating=rating)
+            User.objects.filter(pk=user.pk).update(reputation=F('reputation') + delta)
+        return event
+
+    def record_many(self, entries, reason):
+        """
+        record() for many events at once: one INSERT for the ledger and one
+        UPDATE adding up each user's deltas. `entries` are
+        (user_id, delta, note_id, rating_id) tuples. Returns the events.
+        """
+        events = [
+            self.model(user_id=user_id, delta=delta, reason=reason, note_id=note_id, rating_id=rating_id)
+            for user_id, delta, note_id, rating_id in entries if delta
+        ]
+        if not events:
+            return []
+        totals = {}
+        for event in events:
+            totals[event.user_id] = totals.get(event.user_id, 0) + event.delta
+        with transaction.atomic():
+            self.bulk_create(events)
+            User.objects.filter(pk__in=totals).update(reputation=F('reputation') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in totals.items()], default=Value(0),
+            ))
+        return events
+
+
+class ReputationEvent(models.Model):
+    NOTE_UPLOADED = 'note_uploaded'
+    NOTE_DELETED = 'note_deleted'
+    NOTE_RATED = 'note_rated'
+    ADJUSTMENT = 'adjustment'
+    OPENING_BALANCE = 'opening_balance'
+    REASON_CHOICES = (
+        (NOTE_UPLOADED, 'Note uploaded'),
+        (NOTE_DELETED, 'Note deleted'),
+        (NOTE_RATED, 'Note rated'),
+        (ADJUSTMENT, 'Manual adjustment'),
+        (OPENING_BALANCE, 'Opening balance'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reputation_events')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    # Where the change came from (kept even after the note/rating is gone)
+    note = models.ForeignKey('notes.Note', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    rating = models.ForeignKey('notes.Rating', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ReputationEventManager()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='repevent_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.delta:+d} ({self.get_reason_display()})"
+
+
+# ---
+# BACKGROUND JOBS (see core/queue.py)
+# ---
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (DEAD, 'Dead (gave up)'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # What workers poll: only the (small) set of waiting jobs is indexed
+            models.Index(fields=['run_at', 'id'], name='job_queued_run_at_idx',
+                         condition=models.Q(status='queued')),
+            models.Index(fields=['status', 'locked_at'], name='job_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
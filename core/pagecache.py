@@ -0,0 +1,207 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .dbrouter import use_primary
+
+# ---
+# ANONYMOUS FULL-PAGE CACHE
+# ---
+# Guests all get the same HTML for the landing page, the note list/search
+# and the category list, so those responses are cached whole and served
+# without touching the database. Logged-in users always get a fresh page.
+#
+# The key is the path plus the query parameters the view actually reads
+# (unknown ones dropped, empty ones ignored, order normalized), plus the
+# current version of every *group* of data the page shows:
+#
+#   notes                  any public note (unfiltered list and search pages)
+#   notes:category:<id>    public notes filed in that category
+#   categories             category names and tree (dropdowns, category list)
+#   category-counts        the per-category note counts on the category list
+#
+# Purging a group just starts a new version (core/signals.py,
+# notes.signals), after the transaction commits; pages cached under the old
+# one are never read again and expire after PAGE_CACHE_TIMEOUT.
+
+PAGE_CACHE_VERSION_TIMEOUT = 24 * 60 * 60
+# Where django.contrib.messages keeps pending messages
+MESSAGE_COOKIE_NAME = 'messages'
+MESSAGE_SESSION_KEY = '_messages'
+# Kept with the cached HTML, so hits still answer conditional requests (core/conditional.py)
+STORED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def _version_key(group):
+    return f'pagecache:version:{group}'
+
+
+def group_versions(groups):
+    keys = {_version_key(group): group for group in groups}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, PAGE_CACHE_VERSION_TIMEOUT)
+        found.update(missing)
+    return [found[key] for key in sorted(keys)]
+
+
+async def agroup_versions(groups):
+    keys = {_version_key(group): group for group in groups}
+    found = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, PAGE_CACHE_VERSION_TIMEOUT)
+        found.update(missing)
+    return [found[key] for key in sorted(keys)]
+
+
+def purge(*groups):
+    """Drops every cached page showing one of `groups`, once the current transaction commits."""
+    if not groups:
+        return
+    def bump():
+        version = time.time_ns()
+        cache.set_many({_version_key(group): version for group in groups}, PAGE_CACHE_VERSION_TIMEOUT)
+    transaction.on_commit(bump)
+
+
+def note_groups(category_ids):
+    return ['notes'] + [f'notes:category:{pk}' for pk in category_ids if pk]
+
+
+def purge_notes(notes):
+    """Purges the pages that may show any of the notes in the queryset."""
+    purge(*note_groups(set(notes.order_by().values_list('category_id', flat=True).distinct())))
+
+
+def normalized_params(request, names):
+    params = []
+    for name in sorted(names):
+        value = ' '.join(request.GET.get(name, '').split())
+        if value:
+            params.append(f'{name}={value}')
+    return '&'.join(params)
+
+
+def has_pending_messages(request):
+    """Whether django.contrib.messages has messages waiting to be shown on the next page."""
+    return MESSAGE_COOKIE_NAME in request.COOKIES or MESSAGE_SESSION_KEY in request.session
+
+
+def _is_cacheable_request(request):
+    if not settings.PAGE_CACHE_TIMEOUT or request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending flash messages (e.g. "logged out") must be shown, not a cached page
+    return not has_pending_messages(request)
+
+
+def _page_key(request, params, versions):
+    digest = hashlib.md5(
+        '|'.join([request.path, normalized_params(request, params)] + list(map(str, versions))).encode()
+    ).hexdigest()
+    return f'pagecache:page:{digest}'
+
+
+def _cached_response(request, cached):
+    content, content_type, headers = cached
+    response = HttpResponse(content, content_type=content_type)
+    for name, value in headers.items():
+        response[name] = value
+    response['X-Page-Cache'] = 'hit'
+    return get_conditional_response(
+        request, etag=headers.get('ETag'),
+        last_modified=parse_http_date_safe(headers.get('Last-Modified')), response=response,
+    )
+
+
+def _storable(request, response):
+    """The value to cache for `response`, or None. Marks the response as a miss."""
+    response['X-Page-Cache'] = 'miss'
+    # A page that asked for a CSRF token or sets cookies belongs to one visitor
+    if (response.status_code != 200 or response.streaming or response.cookies
+            or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+        return None
+    headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+    return response.content, response['Content-Type'], headers
+
+
+def serve_cached(request, params, groups, render):
+    """
+    Returns the cached response for this anonymous request, or calls
+    `render()` and caches what it returns (plain 200 pages only).
+    """
+    if not _is_cacheable_request(request):
+        return render()
+
+    key = _page_key(request, params, group_versions(groups))
+    cached = cache.get(key)
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    # Rendered from the primary: pages are missed right after a purge, when
+    # a replica may not have the change yet
+    with use_primary():
+        response = render()
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+    value = _storable(request, response)
+    if value is not None:
+        cache.set(key, value, settings.PAGE_CACHE_TIMEOUT)
+    return response
+
+
+async def aserve_cached(request, params, groups, render):
+    """serve_cached() for async views: `render` returns a coroutine. Needs request.user loaded."""
+    if not _is_cacheable_request(request):
+        return await render()
+
+    key = _page_key(request, params, await agroup_versions(groups))
+    cached = await cache.aget(key)
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    with use_primary():
+        response = await render()
+        if hasattr(response, 'render') and not response.is_rendered:
+            # Templates may still run queries: in a thread, not the event loop
+            await sync_to_async(response.render)()
+    value = _storable(request, response)
+    if value is not None:
+        await cache.aset(key, value, settings.PAGE_CACHE_TIMEOUT)
+    return response
+
+
+def cache_anonymous_page(params=(), groups=()):
+    """serve_cached() for a function view."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return serve_cached(request, params, groups, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class AnonymousPageCacheMixin:
+    """serve_cached() for a class-based view: set page_cache_params and override get_page_cache_groups()."""
+    page_cache_params = ()
+
+    def get_page_cache_groups(self):
+        return []
+
+    def dispatch(self, request, *args, **kwargs):
+        serve = aserve_cached if self.view_is_async else serve_cached
+        return serve(
+            request, self.page_cache_params, self.get_page_cache_groups(),
+            lambda: super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs),
+        )
@@ -0,0 +1,139 @@
+import logging
+import re
+import sys
+from collections import Counter
+
+from django.conf import settings
+
+# ---
+# QUERY INSPECTOR (development and tests)
+# ---
+# core.middleware.QueryInspectorMiddleware records every SQL query a
+# request runs, as a "fingerprint" (the statement with its literals and
+# parameter lists blanked out) plus the place it came from: the innermost
+# frame of our own code and, when the query fired while rendering, the
+# template line being rendered. It then reports:
+#
+# - N+1 patterns: the same fingerprint from the same call site at least
+#   QUERY_INSPECTOR_REPEAT_THRESHOLD times in one request;
+# - views going over their declared query budget:
+#
+#       class NoteListView(ListView):
+#           query_budget = 7
+#
+#       @query_budget(10)
+#       def dashboard_view(request): ...
+#
+# Budgets count every query of the request, including the session and
+# user lookups done by middleware, and should hold with cold caches.
+#
+# QUERY_INSPECTOR = 'log' logs the reports, 'raise' raises
+# QueryInspectionError (an AssertionError) so the test client, and with it
+# the test or `manage.py benchmark_views` run, fails. 'off' removes the
+# middleware.
+
+logger = logging.getLogger(__name__)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+WHITESPACE_RE = re.compile(r'\s+')
+# Transaction control, which depends on whether the request runs inside an
+# outer transaction (as in tests); not counted
+SAVEPOINT_RE = re.compile(r'^\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+# Frames from these files are never "our code", even though they live in the project
+INSPECTOR_FILES = ('core/query_inspector.py', 'core/middleware.py')
+
+
+class QueryInspectionError(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declares the most queries a request to the decorated view (function or class) may run."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_budget(view_func):
+    # Class-based views: the as_view() function keeps the class in view_class
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_class, 'query_budget', None) or getattr(view_func, 'query_budget', None)
+
+
+def fingerprint(sql):
+    """The shape of a statement: same query with different values -> same fingerprint."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = PLACEHOLDER_LIST_RE.sub('%s, ...', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def _project_path(filename):
+    base = str(settings.BASE_DIR)
+    if not filename.startswith(base) or 'site-packages' in filename:
+        return None
+    path = filename[len(base):].lstrip('/\\').replace('\\', '/')
+    if path.startswith(('.venv/', 'venv/')) or path in INSPECTOR_FILES:
+        return None
+    return path
+
+
+def call_site():
+    """'file:line in function' of the innermost project frame, plus the template line if rendering."""
+    code_site = template_site = None
+    frame = sys._getframe(1)
+    while frame is not None and not (code_site and template_site):
+        code = frame.f_code
+        if template_site is None and code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template_site = f'{origin.template_name or origin.name}:{token.lineno}'
+        if code_site is None:
+            path = _project_path(code.co_filename)
+            if path:
+                code_site = f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    if template_site:
+        return f'{code_site} (template {template_site})' if code_site else f'template {template_site}'
+    return code_site or 'unknown'
+
+
+class QueryRecorder:
+    """execute_wrapper collecting (fingerprint, call site) for every query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not SAVEPOINT_RE.match(sql):
+            self.queries.append((fingerprint(sql), call_site()))
+        return execute(sql, params, many, context)
+
+
+def inspect(view_name, queries, budget):
+    """Problems found in one request's queries, as report lines (empty if none)."""
+    problems = []
+    if budget is not None and len(queries) > budget:
+        problems.append(f'{view_name} ran {len(queries)} queries, over its budget of {budget}.')
+
+    threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+    for (shape, site), count in Counter(queries).most_common():
+        if count < threshold:
+            break
+        problems.append(f'{view_name}: {count} identical queries from {site}: {shape[:300]}')
+    return problems
+
+
+def report(view_name, queries, budget):
+    problems = inspect(view_name, queries, budget)
+    if not problems:
+        return
+    message = '\n'.join(problems)
+    if settings.QUERY_INSPECTOR == 'raise':
+        raise QueryInspectionError(message)
+    logger.warning(message)
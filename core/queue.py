@@ -0,0 +1,157 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+# ---
+# DATABASE JOB QUEUE
+# ---
+# Side effects that don't have to finish inside the request are stored as
+# Job rows and run by `manage.py run_workers`. Handlers live in each app's
+# jobs.py and are registered by name:
+#
+#     @job('notes.apply_rating')
+#     def apply_rating(note_id, ...): ...
+#
+#     enqueue('notes.apply_rating', note_id=note.pk, ...)
+#
+# enqueue() writes the row in the caller's transaction, so a job exists if
+# and only if the data it refers to was committed. Workers claim rows with
+# SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can poll the
+# same table without blocking each other or running a job twice.
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_discovered = False
+
+
+def job(name):
+    """Registers the decorated function as the handler for jobs called `name`."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    global _discovered
+    if not _discovered:
+        autodiscover_modules('jobs')
+        _discovered = True
+    return _registry[name]
+
+
+def enqueue(name, run_at=None, max_attempts=None, **payload):
+    """
+    Queues a job. `payload` must be JSON-serializable and is passed to the
+    handler as keyword arguments. With JOB_QUEUE_EAGER the job runs right
+    after the surrounding transaction commits instead (handy without workers).
+    """
+    from .models import Job
+
+    job = Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_QUEUE_MAX_ATTEMPTS,
+    )
+    if settings.JOB_QUEUE_EAGER:
+        transaction.on_commit(lambda: _run_eagerly(job.pk))
+    return job
+
+
+def _run_eagerly(pk):
+    job = claim('eager', pk=pk)
+    if job is not None:
+        run_job(job)
+
+
+def claim(worker_id, pk=None):
+    """
+    Locks the next due job (or the job `pk`, if still queued), marks it
+    running and returns it, or None. The claim commits immediately; the job
+    then runs without holding any lock.
+    """
+    from .models import Job
+
+    queued = Job.objects.select_for_update(skip_locked=True).filter(status=Job.QUEUED)
+    with transaction.atomic():
+        if pk is not None:
+            job = queued.filter(pk=pk).first()
+        else:
+            job = queued.filter(run_at__lte=timezone.now()).order_by('run_at', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_at = timezone.now()
+        job.locked_by = worker_id
+        job.save(update_fields=['status', 'attempts', 'locked_at', 'locked_by', 'updated_at'])
+    return job
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: exponential, capped, with jitter."""
+    delay = min(settings.JOB_QUEUE_BACKOFF_BASE * 2 ** (attempts - 1), settings.JOB_QUEUE_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_job(job):
+    """
+    Runs a claimed job. The handler's writes and the job's 'done' status are
+    committed together, so a job's effects are applied exactly once even if
+    the worker dies halfway. Returns True on success.
+    """
+    from .models import Job
+
+    try:
+        with transaction.atomic():
+            get_handler(job.name)(**job.payload)
+            Job.objects.filter(pk=job.pk).update(status=Job.DONE, last_error='', updated_at=timezone.now())
+        return True
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts)
+
+    if job.attempts >= job.max_attempts:
+        # Dead letter: kept for inspection and manual retry from the admin
+        Job.objects.filter(pk=job.pk).update(status=Job.DEAD, last_error=error, updated_at=timezone.now())
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED,
+            run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+            last_error=error,
+            updated_at=timezone.now(),
+        )
+    return False
+
+
+def requeue_stale():
+    """
+    Puts 'running' jobs whose worker apparently died (no result after
+    JOB_QUEUE_STALE_AFTER seconds) back in the queue. Their attempt still counts.
+    """
+    from .models import Job
+
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_QUEUE_STALE_AFTER)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.DEAD, last_error='Worker lost while running the job.', updated_at=timezone.now(),
+    )
+    requeued = stale.update(status=Job.QUEUED, run_at=timezone.now(), updated_at=timezone.now())
+    return requeued, dead
+
+
+def purge_finished():
+    """Deletes 'done' jobs older than JOB_QUEUE_KEEP_DONE seconds. Dead ones are kept."""
+    from .models import Job
+
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_QUEUE_KEEP_DONE)
+    return Job.objects.filter(status=Job.DONE, updated_at__lt=cutoff).delete()[0]
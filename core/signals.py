@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from categories.models import Category
+from notes.models import Note, Rating
+from .dashboard import invalidate_dashboard_snapshot
+from .pagecache import note_groups, purge
+from .models import User, ReputationEvent
+
+
+# ---
+# DASHBOARD SNAPSHOT INVALIDATION
+# ---
+# Dropped once the change commits: dropped any earlier, a dashboard request
+# in between would rebuild it from the old data and cache that instead.
+@receiver([post_save, post_delete], sender=Note)
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=ReputationEvent)  # reputation moves the leaderboard
+def dashboard_source_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_dashboard_snapshot)
+
+
+@receiver([post_save, post_delete], sender=User)
+def dashboard_user_changed(sender, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which the dashboard doesn't show
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(invalidate_dashboard_snapshot)
+
+
+# ---
+# ANONYMOUS PAGE CACHE PURGING (core/pagecache.py)
+# ---
+# Changes to a note's tags, category name or uploader go through
+# notes.signals, which purges the notes' pages itself.
+RATING_ONLY_FIELDS = set(Note.RATING_FIELDS) | {'updated_at'}
+
+
+@receiver(post_save, sender=Note)
+def note_pages_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Votes are too frequent to purge on; cached averages may lag by PAGE_CACHE_TIMEOUT
+    if raw or (update_fields and set(update_fields) <= RATING_ONLY_FIELDS):
+        return
+    # (category, is_public) of the row before this save, when it could change (notes.signals)
+    before = getattr(instance, '_counted_before', None)
+    after = (instance.category_id, instance.is_public)
+    shown_in = [category for category, is_public in {before, after} - {None} if is_public]
+    groups = note_groups(shown_in) if shown_in else []
+    if created or (before and before != after):
+        groups.append('category-counts')
+    purge(*groups)
+
+
+@receiver(post_delete, sender=Note)
+def note_pages_deleted(sender, instance, **kwargs):
+    groups = note_groups([instance.category_id]) if instance.is_public else []
+    purge(*groups, 'category-counts')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_pages_changed(sender, **kwargs):
+    purge('categories', 'category-counts')
+
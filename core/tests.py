@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.forms import FileField, MultiWidget
+from django.test import TestCase
+from django.urls import reverse
+
+from core.dashboard import DASHBOARD_CACHE_KEY, get_dashboard_snapshot
+from core.models import ReputationEvent, User
+from notes.models import Note
+
+
+class DashboardSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('uploader', password='pw', role='teacher')
+
+    def test_dropped_when_the_change_commits(self):
+        get_dashboard_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.create(title='Week 1', file='notes/00/week1.pdf', uploader=self.user)
+            # Still cached inside the writer's transaction: a rebuild now would see the old data
+            self.assertIsNotNone(cache.get(DASHBOARD_CACHE_KEY))
+        self.assertIsNone(cache.get(DASHBOARD_CACHE_KEY))
+        self.assertEqual(get_dashboard_snapshot()['note_count'], 1)
+
+    def test_login_keeps_the_snapshot(self):
+        get_dashboard_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.user)
+        self.assertIsNotNone(cache.get(DASHBOARD_CACHE_KEY))
+
+
+class UserAdminReputationTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.user = User.objects.create_user('uploader', password='pw', reputation=10)
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:core_user_change', args=[self.user.pk])
+
+    def opened_form_data(self):
+        """The change form's fields as the browser would submit them unedited."""
+        form = self.client.get(self.url, secure=True).context['adminform'].form
+        data = {}
+        for bound in form:
+            if bound.field.disabled or isinstance(bound.field, FileField) or bound.value() is None:
+                continue
+            widget = bound.field.widget
+            if isinstance(widget, MultiWidget):
+                for i, part in enumerate(widget.decompress(bound.value())):
+                    data[f'{bound.html_name}_{i}'] = widget.widgets[i].format_value(part) or ''
+            elif bound.value() is not False:
+                data[bound.html_name] = bound.value()
+        return data
+
+    def test_edit_keeps_concurrent_reputation_changes(self):
+        data = self.opened_form_data()
+        # A rating job runs while the form is open
+        ReputationEvent.objects.record(self.user, 5, ReputationEvent.NOTE_RATED)
+        response = self.client.post(self.url, dict(data, bio='Maths tutor'), secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, 'Maths tutor')
+        self.assertEqual(self.user.reputation, 15)
+
+    def test_adjustment_is_recorded(self):
+        data = self.opened_form_data()
+        ReputationEvent.objects.record(self.user, 5, ReputationEvent.NOTE_RATED)
+        self.client.post(self.url, dict(data, reputation_adjustment=-3), secure=True)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.reputation, 12)
+        self.assertEqual(self.user.reputation_events.get(reason=ReputationEvent.ADJUSTMENT).delta, -3)
@@ -7,4 +7,7 @@ urlpatterns = [
     
     # Add a specific path for the dashboard
     path('dashboard/', views.dashboard_view, name="dashboard"), 
+
+    # Prometheus metrics (staff or METRICS_TOKEN only)
+    path('metrics/', views.metrics_view, name="metrics"),
 ]
\ No newline at end of file
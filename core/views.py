@@ -3,16 +3,22 @@ from .forms import CustomUserCreationForm
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-import json
+from django.conf import settings
 from datetime import date, timedelta
 
-# Import models for Dashboard
-from notes.models import Note
-from categories.models import Category
-from core.models import User
-from django.db.models import Count, Avg
+# Dashboard data is served from a cached snapshot
+from .dashboard import get_dashboard_snapshot
+from .dbrouter import reads_from_replica
+from .metrics import CONTENT_TYPE, render_metrics
+from .pagecache import cache_anonymous_page
+from .query_inspector import query_budget
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
 
 # View for the public landing page
+@cache_anonymous_page()
 def landing_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -21,42 +27,16 @@ def landing_view(request):
 
 # View for the dashboard (requires login)
 @login_required
+@reads_from_replica
+@query_budget(10)  # with a cold snapshot cache; a warm one needs 3
 def dashboard_view(request):
     
-    # --- "VILLAIN ARC" DATA QUERIES ---
-    
-    # 1. Top Stat Cards (Same as before)
-    note_count = Note.objects.count()
-    category_count = Category.objects.count()
-    user_count = User.objects.filter(is_active=True).count()
-    
-    # 2. Chart Data: Notes per Category (Same as before)
-    category_notes = Category.objects.annotate(count=Count('notes')).order_by('-count')
-    cat_labels = json.dumps([c.name for c in category_notes])
-    cat_data = json.dumps([c.count for c in category_notes])
-
-    # 3. Recent/Top Notes (Same as before)
-    recent_notes = Note.objects.select_related('uploader', 'category').filter(is_public=True).order_by('-created_at')[:5]
-    top_notes = Note.objects.select_related('uploader', 'category').filter(is_public=True).order_by('-average_rating')[:5]
-
-    # 4. --- NEW: LEADERBOARD DATA ---
-    # Get the top 5 users, ordered by their reputation
-    top_users = User.objects.filter(is_active=True).order_by('-reputation')[:5]
-    # --- END NEW DATA ---
-
-    context = {
-        'note_count': note_count,
-        'category_count': category_count,
-        'user_count': user_count,
-        
-        'category_chart_labels': cat_labels,
-        'category_chart_data': cat_data,
-        
-        'recent_notes': recent_notes,
-        'top_notes': top_notes,
-        
-        'top_users': top_users, # <-- The missing piece!
-    } 
+    # --- "VILLAIN ARC" DATA ---
+    # Stat cards, category chart, recent/top notes and the leaderboard all
+    # come from one cached snapshot (see core/dashboard.py), so a warm
+    # dashboard doesn't run any of those queries.
+    context = dict(get_dashboard_snapshot())
+    context['dashboard_cache_timeout'] = settings.DASHBOARD_CACHE_TIMEOUT
     # This template was updated in the "Villain Arc"
     return render(request, 'core/dashboard.html', context)
 
@@ -92,4 +72,14 @@ def register_view(request):
         form = CustomUserCreationForm()
     
     # This template was updated in the "Villain Arc"
-    return render(request, 'registration/register.html', {'form': form})
\ No newline at end of file
+    return render(request, 'registration/register.html', {'form': form})
+
+# Prometheus scrape endpoint: staff users, or a scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>"
+@never_cache
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    has_token = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (has_token or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
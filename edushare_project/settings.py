@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',  # Full-text search fields and GIN indexes
 
     # Third-party apps
     'django_cleanup.apps.CleanupConfig',  # Automatically delete unused media files
@@ -88,6 +89,86 @@ if not DEBUG:
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 
+# Cache settings
+# Per-process memory cache by default; set CACHE_LOCATION to a directory to
+# share the cache between processes with the file-based backend.
+if os.getenv('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'edushare',
+        }
+    }
+
+# Upper bound (seconds) on how stale the cached dashboard snapshot may get
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+
+# Cached category tree (categories/tree.py): seconds between version checks
+# per process, and how long a version lives (bounds staleness with per-process caches)
+CATEGORY_TREE_CHECK_INTERVAL = float(os.getenv('CATEGORY_TREE_CHECK_INTERVAL', '1'))
+CATEGORY_TREE_TIMEOUT = int(os.getenv('CATEGORY_TREE_TIMEOUT', '300'))
+
+# Whole-page cache for guests (core/pagecache.py); pages are purged on
+# changes, this bounds how old a rating average on them can get. 0 = off
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+
+# Part of every page ETag (core/conditional.py): change it on each deploy
+# so browsers drop pages rendered by the previous templates
+RELEASE_VERSION = os.getenv('RELEASE_VERSION', '')
+
+# Note file downloads (notes/<pk>/download/)
+# Set NOTE_DOWNLOAD_ACCEL to 'nginx' (X-Accel-Redirect) or 'sendfile'
+# (X-Sendfile, Apache/lighttpd) to let the front proxy send the bytes.
+# For nginx, NOTE_DOWNLOAD_ACCEL_PREFIX must be an `internal` location
+# aliased to MEDIA_ROOT.
+NOTE_DOWNLOAD_ACCEL = os.getenv('NOTE_DOWNLOAD_ACCEL', '')
+NOTE_DOWNLOAD_ACCEL_PREFIX = os.getenv('NOTE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+
+# Resumable chunked uploads (notes/uploads/), used for files too big for one POST
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'upload_chunks'))
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB, suggested to clients
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', str(500 * 1024 * 1024)))  # 500MB
+
+# Text extraction from uploaded PDF/DOCX/PPTX files into the search index
+NOTE_EXTRACTION_WORKERS = int(os.getenv('NOTE_EXTRACTION_WORKERS', '2'))  # pool size per job worker, 0 = only via extract_note_text
+NOTE_CONTENT_TEXT_MAX_CHARS = int(os.getenv('NOTE_CONTENT_TEXT_MAX_CHARS', '100000'))
+
+# Background job queue (core/queue.py), run with `manage.py run_workers`
+JOB_QUEUE_EAGER = os.getenv('JOB_QUEUE_EAGER', 'False') == 'True'  # run jobs right after commit, no workers needed
+JOB_QUEUE_MAX_ATTEMPTS = 5
+JOB_QUEUE_BACKOFF_BASE = 10  # seconds before the first retry, doubled on each attempt
+JOB_QUEUE_BACKOFF_MAX = 60 * 60
+JOB_QUEUE_STALE_AFTER = 10 * 60  # a job running this long is assumed to have lost its worker
+JOB_QUEUE_POLL_INTERVAL = 1.0
+JOB_QUEUE_KEEP_DONE = 7 * 24 * 60 * 60  # finished jobs are deleted after a week
+
+# Per-process LRU cache of tag name -> id used when tagging notes (notes/tags.py)
+TAG_CACHE_SIZE = 2048
+TAG_AUTOCOMPLETE_CACHE_TIMEOUT = 60  # seconds, for notes/tags/autocomplete/
+
+# Most notes one request to notes/ratings/ (batch rating API) may rate or look up
+RATING_BATCH_MAX_SIZE = int(os.getenv('RATING_BATCH_MAX_SIZE', '100'))
+
+# Per-view request metrics (core/metrics.py), scraped from /metrics/
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR', '')  # shared by all worker processes; empty = this process only. Clear on deploy.
+METRICS_FLUSH_INTERVAL = 5  # seconds between snapshots written to METRICS_DIR
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # lets a scraper in without a staff login
+
+# N+1 and query budget checks (core/query_inspector.py): 'off', 'log' or 'raise'
+QUERY_INSPECTOR = os.getenv('QUERY_INSPECTOR', 'log' if DEBUG else 'off')
+QUERY_INSPECTOR_REPEAT_THRESHOLD = 5  # same query from the same place this often in one request = N+1
+
+# Async note list/search/detail and rating views (notes/views.py), for ASGI servers (edushare_project/asgi.py)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 # Email settings (replace with your email service details)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -97,11 +178,15 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.DatabaseRoutingMiddleware',  # inside sessions: saving the session is not the view writing
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.AsyncUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -112,8 +197,16 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'], # Global templates dir (if any)
-        'APP_DIRS': True, # This tells Django to look inside each app's 'templates' folder
         'OPTIONS': {
+            # Templates are compiled once per process and kept; in development
+            # the autoreloader clears them whenever a template file changes.
+            # app_directories looks inside each app's 'templates' folder.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -138,6 +231,29 @@ DATABASES = {
     }
 }
 
+# Read replicas (core/dbrouter.py): DATABASE_REPLICAS is a comma-separated
+# list of "host:port/name" entries, any part left out is taken from the
+# primary (e.g. "/edushare_replica" is another database on the same server).
+# Read-only views read from them; everything else uses 'default'.
+REPLICA_DATABASES = []
+for number, spec in enumerate(filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), start=1):
+    address, _, name = spec.strip().partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host or DATABASES['default']['HOST'],
+        PORT=port or DATABASES['default']['PORT'],
+        NAME=name or DATABASES['default']['NAME'],
+        TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.dbrouter.PrimaryReplicaRouter']
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))  # seconds; a replica further behind is skipped
+REPLICA_CHECK_INTERVAL = 5  # seconds between lag checks of each replica, per process
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '15'))  # reads stay on the primary this long after a client writes
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'notes'
\ No newline at end of file
+    name = 'notes'
+
+    def ready(self):
+        # Register signal handlers (search vector maintenance, etc.)
+        from . import signals  # noqa: F401
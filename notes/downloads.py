@@ -0,0 +1,149 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_etags, quote_etag
+from django.utils.text import slugify
+
+# ---
+# NOTE FILE DOWNLOADS
+# ---
+# Helpers for NoteDownloadView: strong validators, single byte-range
+# support (what PDF viewers use), chunked streaming, and optional hand-off
+# of the transfer to the front proxy (X-Accel-Redirect / X-Sendfile).
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_validators(field_file, sha256=''):
+    """
+    Returns (etag, last_modified_timestamp, size) for a stored file.
+    The ETag is strong: the content hash when we know it, otherwise a
+    digest of the stored name, size and modification time.
+    """
+    storage = field_file.storage
+    size = storage.size(field_file.name)
+    try:
+        modified = storage.get_modified_time(field_file.name).timestamp()
+    except NotImplementedError:
+        modified = None
+    digest = sha256 or hashlib.sha256(f'{field_file.name}:{size}:{modified}'.encode()).hexdigest()[:32]
+    return quote_etag(digest), modified, size
+
+
+def parse_range(header, size):
+    """
+    Parses a single `bytes=start-end` range against a file of `size` bytes.
+    Returns (start, end) inclusive, None when the header should be ignored
+    (absent, malformed or multi-range), or False when it can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def stream_file(field_file, start, length):
+    """Yields `length` bytes of the file from `start`, CHUNK_SIZE at a time."""
+    with field_file.storage.open(field_file.name, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _accel_response(field_file):
+    """Lets the front proxy send the bytes, if NOTE_DOWNLOAD_ACCEL is configured."""
+    mode = settings.NOTE_DOWNLOAD_ACCEL
+    if mode == 'nginx':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.NOTE_DOWNLOAD_ACCEL_PREFIX + field_file.name
+        return response
+    if mode == 'sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = field_file.path
+        return response
+    return None
+
+
+def serve_note_file(request, note, as_attachment=True):
+    """
+    Builds the download response for `note.file`, honouring If-None-Match,
+    If-Modified-Since, Range and If-Range.
+    """
+    field_file = note.file
+    etag, modified, size = file_validators(field_file, note.file_sha256)
+    last_modified = http_date(modified) if modified is not None else None
+
+    # 304 Not Modified (or 412) before touching the file contents
+    response = get_conditional_response(request, etag=etag, last_modified=modified and int(modified))
+    if response is None:
+        response = _accel_response(field_file)
+        if response is None:
+            response = _streaming_response(request, field_file, etag, size)
+
+    # Stored names are content hashes, so offer the note's title instead
+    extension = os.path.splitext(field_file.name)[1].lower()
+    filename = f"{slugify(note.title) or 'note'}{extension}"
+    content_type, encoding = mimetypes.guess_type(filename)
+    if response.status_code != 304:
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+
+    # Public notes may be cached by shared caches; private ones only by the browser
+    if note.is_public:
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    else:
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    return response
+
+
+def _streaming_response(request, field_file, etag, size):
+    byte_range = parse_range(request.headers.get('Range'), size)
+
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and etag not in parse_etags(if_range):
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(stream_file(field_file, start, length), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        length = size
+        response = StreamingHttpResponse(stream_file(field_file, 0, size))
+    response['Content-Length'] = str(length)
+    return response
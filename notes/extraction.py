@@ -0,0 +1,144 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# ---
+# NOTE TEXT EXTRACTION
+# ---
+# Pulls plain text out of uploaded PDF/DOCX/PPTX files so their contents
+# can be searched. The parsing runs in a process pool: it's CPU-bound and
+# the parsers hold the GIL. Workers only read files and return text; all
+# database writes happen in the parent process.
+#
+# This module deliberately has no Django imports at the top, so that
+# spawned worker processes start quickly.
+
+logger = logging.getLogger(__name__)
+
+
+def _pdf_text(path):
+    from pypdf import PdfReader
+    for page in PdfReader(path).pages:
+        yield page.extract_text() or ''
+
+
+def _docx_text(path):
+    from docx import Document
+    document = Document(path)
+    for paragraph in document.paragraphs:
+        yield paragraph.text
+    for table in document.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield cell.text
+
+
+def _pptx_text(path):
+    from pptx import Presentation
+    for slide in Presentation(path).slides:
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                yield shape.text_frame.text
+
+
+EXTRACTORS = {
+    '.pdf': _pdf_text,
+    '.docx': _docx_text,
+    '.pptx': _pptx_text,
+}
+
+
+def extract_text(path, max_chars):
+    """
+    Returns up to `max_chars` characters of plain text from the file at
+    `path`, '' for unsupported file types, or None if parsing failed (a
+    missing parser library or an unreadable file), so it is tried again.
+    """
+    extractor = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return ''
+    parts = []
+    length = 0
+    try:
+        for text in extractor(path):
+            text = text.replace('\x00', ' ').strip()  # PostgreSQL text can't hold NULs
+            if not text:
+                continue
+            parts.append(text)
+            length += len(text) + 1
+            if length >= max_chars:
+                break
+    except ImportError as e:
+        logger.warning('Text extraction skipped for %s: %s', path, e)
+        return None
+    except Exception:
+        logger.exception('Text extraction failed for %s', path)
+        return None
+    return '\n'.join(parts)[:max_chars]
+
+
+def extract_job(job):
+    """
+    Worker entry point: (note_id, path, sha256, max_chars) -> (note_id, sha256, text).
+    `text` is None when the file is missing or couldn't be parsed, so the
+    note is retried later.
+    """
+    note_id, path, sha256, max_chars = job
+    if not os.path.exists(path):
+        return note_id, sha256, None
+    return note_id, sha256, extract_text(path, max_chars)
+
+
+def new_pool(max_workers=None):
+    # 'spawn' rather than fork: the parent may be a threaded web process
+    # holding database connections.
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+# ---
+# SHARED POOL (used by the notes.extract_text job)
+# ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    from django.conf import settings
+    with _pool_lock:
+        if _pool is None:
+            _pool = new_pool(settings.NOTE_EXTRACTION_WORKERS)
+        return _pool
+
+
+def job_for(note):
+    """The extract_job() argument tuple for a note, or None if it has no local file."""
+    from django.conf import settings
+    if not note.file or not note.file_sha256:
+        return None
+    try:
+        path = note.file.path
+    except NotImplementedError:
+        return None
+    return note.pk, path, note.file_sha256, settings.NOTE_CONTENT_TEXT_MAX_CHARS
+
+
+def store_results(results):
+    """
+    Saves (note_id, sha256, text) results and refreshes the search vectors.
+    A result is dropped if the note's file changed while it was extracted.
+    """
+    from .models import Note
+    from .search import update_search_vectors
+
+    stored = []
+    for note_id, sha256, text in results:
+        if text is None:
+            continue
+        if Note.objects.filter(pk=note_id, file_sha256=sha256).update(content_text=text, content_sha256=sha256):
+            stored.append(note_id)
+    if stored:
+        update_search_vectors(Note.objects.filter(pk__in=stored))
+    return len(stored)
@@ -1,5 +1,8 @@
 from django import forms
-from .models import Note, Rating, Tag 
+from .models import Note, Rating, Tag, UploadSession
+from .uploads import AssembledUpload, discard
+from .storage import blob_sha256
+from .tags import set_note_tags
 import json 
 
 class NoteForm(forms.ModelForm):
@@ -20,15 +23,23 @@ class NoteForm(forms.ModelForm):
         })
     )
 
-    def __init__(self, *args, **kwargs):
+    # --- CHUNKED UPLOAD ---
+    # Set by the upload JS when a large file was sent through notes/uploads/
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, user=None, **kwargs):
+        self.user = user
+        self.upload_session = None
         super().__init__(*args, **kwargs)
+        # Before validation puts the new upload on the instance
+        self.previous_file_name = self.instance.file.name if self.instance.pk else ''
         
         if self.instance and self.instance.pk:
             self.fields['tags'].initial = ', '.join([t.name for t in self.instance.tags.all()])
 
         # Apply Tailwind classes to all fields
         for field_name, field in self.fields.items():
-            if field_name == 'tags': 
+            if field_name in ('tags', 'upload_id'): 
                 continue
             if isinstance(field.widget, forms.Textarea):
                  field.widget.attrs.update({'class': self.FORM_TEXTAREA_CLASSES, 'rows': 4})
@@ -42,6 +53,20 @@ class NoteForm(forms.ModelForm):
                  field.widget.attrs.update({'class': self.FORM_INPUT_CLASSES})
         
         self.fields['category'].required = False
+        # A file can come either from this field or from a finished chunked upload
+        self.fields['file'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload_id = cleaned_data.get('upload_id')
+        if upload_id:
+            session = UploadSession.objects.filter(pk=upload_id, user=self.user).first()
+            if session is None or not session.is_complete:
+                raise forms.ValidationError("The file upload did not finish. Please upload the file again.")
+            self.upload_session = session
+        elif not cleaned_data.get('file') and not self.instance.file:
+            self.add_error('file', "Please choose a file to upload.")
+        return cleaned_data
 
     class Meta:
         model = Note
@@ -63,6 +88,33 @@ class NoteForm(forms.ModelForm):
         # We save with commit=False to get the instance
         # but NOT save the m2m fields yet.
         note = super().save(commit=False)
+
+        stored_upload = False
+        if self.upload_session:
+            # Move the assembled temp file into storage; its hash was
+            # computed chunk by chunk while it was uploaded.
+            upload = AssembledUpload(self.upload_session)
+            try:
+                note.file.save(self.upload_session.filename, upload, save=False)
+            finally:
+                upload.close()
+            note.file_sha256 = blob_sha256(note.file.name) or self.upload_session.sha256
+            discard(self.upload_session)
+            self.upload_session.delete()
+            stored_upload = True
+        elif 'file' in self.changed_data and note.file:
+            # Store it now: the content-addressed name carries the hash
+            uploaded = self.cleaned_data['file']
+            note.file.save(uploaded.name, uploaded, save=False)
+            note.file_sha256 = blob_sha256(note.file.name) or ''
+            stored_upload = True
+
+        if stored_upload and self.previous_file_name and note.file.name == self.previous_file_name:
+            # A new upload with the same content: storing it took a second
+            # reference to the blob, but the name didn't change, so
+            # django_cleanup will never release the old one. Give the extra
+            # one back. (Edits without a new file took no reference.)
+            note.file.storage.delete(note.file.name)
         
         # Manually save the instance if commit is True
         if commit:
@@ -78,14 +130,10 @@ class NoteForm(forms.ModelForm):
             tags_str = self.cleaned_data.get('tags', '')
             tag_names = [name.strip() for name in tags_str.split(',') if name.strip()]
 
-        # Find or create new tags and add them to the note
-        tags_to_add = []
-        for name in tag_names:
-            tag, created = Tag.objects.get_or_create(name=name.lower().strip())
-            tags_to_add.append(tag)
-        
-        # This is the correct way to save m2m fields
-        note.tags.set(tags_to_add)
+        # Find or create the tags in bulk and write the links in one batch
+        # (constant number of queries, see notes/tags.py)
+        if note.pk:
+            set_note_tags(note, tag_names)
         
         return note
     # --- END FIX ---
@@ -0,0 +1,68 @@
+from django.db import transaction
+
+from core.dashboard import invalidate_dashboard_snapshot
+from core.models import ReputationEvent
+from core.queue import job
+from .extraction import extract_job, get_pool, job_for, store_results
+from .models import Note, Rating
+
+
+@job('notes.apply_rating')
+def apply_rating(note_id, rating_id, old_value, new_value):
+    """
+    Follow-up of a vote (RateNoteView): updates the note's rating aggregates
+    and the uploader's reputation. Both are deltas, so jobs for the same
+    note can run in any order.
+    """
+    note = Note.objects.filter(pk=note_id).first()
+    if note is None:
+        return  # the note (and its ratings) were deleted
+    note.apply_rating_change(old_value=old_value, new_value=new_value)
+
+    rep_delta = Rating.reputation_for(new_value) - Rating.reputation_for(old_value)
+    rating = Rating.objects.filter(pk=rating_id).first()
+    ReputationEvent.objects.record(note.uploader, rep_delta, ReputationEvent.NOTE_RATED, note=note, rating=rating)
+
+
+@job('notes.apply_ratings')
+def apply_ratings(changes):
+    """
+    Follow-up of a batch of votes (BatchRatingView): apply_rating() for each
+    [note_id, rating_id, old_value, new_value] in `changes`, with one UPDATE
+    for all the notes' aggregates and one for all the uploaders' reputation.
+    """
+    uploaders = dict(Note.objects.filter(pk__in=[change[0] for change in changes]).values_list('pk', 'uploader_id'))
+    # Notes deleted since (and their ratings) are skipped
+    changes = [change for change in changes if change[0] in uploaders]
+    if not changes:
+        return
+    ratings = set(Rating.objects.filter(pk__in=[change[1] for change in changes]).values_list('pk', flat=True))
+
+    Note.apply_rating_changes((note_id, old_value, new_value) for note_id, _, old_value, new_value in changes)
+    ReputationEvent.objects.record_many(
+        [
+            (uploaders[note_id], Rating.reputation_for(new_value) - Rating.reputation_for(old_value),
+             note_id, rating_id if rating_id in ratings else None)
+            for note_id, rating_id, old_value, new_value in changes
+        ],
+        ReputationEvent.NOTE_RATED,
+    )
+    # Bulk writes send no signals (core/signals.py): top notes and the leaderboard changed
+    transaction.on_commit(invalidate_dashboard_snapshot)
+
+
+@job('notes.extract_text')
+def extract_text(note_id):
+    """Extracts a note's file text for search, see notes/extraction.py."""
+    note = Note.objects.filter(pk=note_id).only('file', 'file_sha256', 'content_sha256').first()
+    if note is None or not note.needs_text_extraction:
+        return
+    args = job_for(note)
+    if args is not None:
+        # Parsing runs in the process pool; this worker thread just waits
+        result = get_pool().submit(extract_job, args).result()
+        if result[2] is None:
+            # Nothing is stored, so the note still needs extraction; the
+            # queue retries the job with backoff
+            raise RuntimeError(f'Text extraction failed for note {note_id}')
+        store_results([result])
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes.models import UploadSession
+from notes.uploads import discard
+
+
+class Command(BaseCommand):
+    help = 'Deletes chunked upload sessions (and their temp files) that have not been touched for a while.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Remove sessions idle for longer than this many hours (default: 24).')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            discard(session)
+            count += 1
+        stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} stale upload session(s).'))
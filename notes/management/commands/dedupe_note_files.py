@@ -0,0 +1,104 @@
+import hashlib
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from notes.models import Note, FileBlob
+from notes.storage import HASH_BLOCK_SIZE, blob_name, blob_sha256, note_file_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves existing note files into content-addressed storage, merging duplicates, '
+        'and rebuilds the blob reference counts from the notes that use them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without touching files or rows.')
+        parser.add_argument('--purge-unreferenced', action='store_true',
+                            help='Also delete blobs that no note references any more.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        storage = note_file_storage
+
+        # 1. Re-home every legacy file name under its content hash
+        legacy_names = [
+            name for name in Note.objects.exclude(file='').order_by().values_list('file', flat=True).distinct()
+            if not blob_sha256(name)
+        ]
+        moved = merged = missing = 0
+        seen_targets = set()  # so a dry run counts duplicates correctly
+        for name in legacy_names:
+            if not storage.exists(name):
+                self.stdout.write(self.style.WARNING(f'Missing on disk, skipped: {name}'))
+                missing += 1
+                continue
+
+            sha256 = self._hash(storage.path(name))
+            directory, filename = os.path.split(name)
+            target = blob_name(directory, sha256, os.path.splitext(filename)[1])
+
+            if target in seen_targets or storage.exists(target):
+                merged += 1
+                self.stdout.write(f'{name} -> {target} (duplicate, removed)')
+                if not self.dry_run:
+                    os.remove(storage.path(name))
+            else:
+                moved += 1
+                seen_targets.add(target)
+                self.stdout.write(f'{name} -> {target}')
+                if not self.dry_run:
+                    os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+                    os.replace(storage.path(name), storage.path(target))
+
+            if not self.dry_run:
+                # queryset.update() on purpose: no signals, so django_cleanup
+                # doesn't try to delete the old name we just moved away.
+                Note.objects.filter(file=name).update(file=target, file_sha256=sha256)
+
+        # 2. Rebuild reference counts from the notes themselves
+        references = dict(
+            Note.objects.exclude(file='').order_by().values_list('file').annotate(n=Count('id'))
+        )
+        created = 0
+        with transaction.atomic():
+            if not self.dry_run:
+                for name, count in references.items():
+                    sha256 = blob_sha256(name)
+                    if not sha256 or not storage.exists(name):
+                        continue
+                    _, was_created = FileBlob.objects.update_or_create(
+                        name=name,
+                        defaults={'sha256': sha256, 'size': storage.size(name), 'refcount': count},
+                    )
+                    created += was_created
+                FileBlob.objects.exclude(name__in=references.keys()).update(refcount=0)
+                # Notes already on blob names but without a recorded hash
+                for note in Note.objects.exclude(file='').filter(file_sha256='').only('file').iterator():
+                    Note.objects.filter(pk=note.pk).update(file_sha256=blob_sha256(note.file.name) or '')
+
+        unreferenced = FileBlob.objects.filter(refcount__lte=0)
+        unreferenced_count = unreferenced.count()
+        purged = 0
+        if options['purge_unreferenced'] and not self.dry_run:
+            for blob in unreferenced:
+                storage.delete(blob.name)  # refcount <= 1 -> removes file and row
+                purged += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} file(s) moved, {merged} duplicate(s) merged, {missing} missing; '
+            f'{len(references)} blob(s) referenced ({created} newly tracked); '
+            f'{unreferenced_count} unreferenced, {purged} purged.'
+            + (' [dry run]' if self.dry_run else '')
+        ))
+
+    def _hash(self, path):
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
@@ -0,0 +1,50 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from notes.extraction import extract_job, job_for, new_pool, store_results
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        'Extracts searchable text from note files (PDF/DOCX/PPTX) in parallel worker processes. '
+        'By default only notes whose file changed since the last extraction are processed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of worker processes (default: number of CPUs).')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Number of results saved per write (default: 200).')
+        parser.add_argument('--all', action='store_true',
+                            help='Re-extract every note, even if its file is unchanged.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Note.objects.exclude(file='').exclude(file_sha256='')
+        if not options['all']:
+            queryset = queryset.exclude(content_sha256=F('file_sha256'))
+        queryset = queryset.only('file', 'file_sha256').order_by('pk')
+
+        jobs = (job for job in map(job_for, queryset.iterator(chunk_size=batch_size)) if job)
+        processed = stored = 0
+        batch = []
+        with new_pool(options['workers']) as pool:
+            # Results come back in submission order; chunksize keeps IPC overhead down
+            for result in pool.map(extract_job, jobs, chunksize=16):
+                batch.append(result)
+                processed += 1
+                if len(batch) >= batch_size:
+                    stored += store_results(batch)
+                    batch = []
+                    self.stdout.write(f'...{processed} files processed')
+            if batch:
+                stored += store_results(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Text extracted from {processed} files, {stored} notes updated '
+            f'(capped at {settings.NOTE_CONTENT_TEXT_MAX_CHARS} characters each).'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notes.models import Note
+from notes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Backfills (or rebuilds) the stored full-text search vector of every note, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of notes updated per transaction (default: 1000).')
+        parser.add_argument('--only-missing', action='store_true',
+                            help='Only fill notes that have no search vector yet.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Note.objects.all()
+        if options['only_missing']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        # Walk the table by primary key so each batch is a cheap range scan
+        last_pk = 0
+        total = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                total += update_search_vectors(Note.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+            self.stdout.write(f'...{total} notes indexed')
+
+        self.stdout.write(self.style.SUCCESS(f'Search vectors rebuilt for {total} notes.'))
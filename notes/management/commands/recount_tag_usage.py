@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from notes.models import Note, Tag
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every tag\'s stored note_count (used to rank tag autocomplete) from the note/tag links.'
+
+    def handle(self, *args, **options):
+        actual = Coalesce(
+            Subquery(
+                Note.tags.through.objects.filter(tag=OuterRef('pk')).order_by()
+                .values('tag').annotate(n=Count('id')).values('n'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+        # Only rewrite the rows that drifted
+        fixed = Tag.objects.annotate(actual=actual).exclude(note_count=F('actual')).update(note_count=actual)
+        self.stdout.write(self.style.SUCCESS(f'Tag usage counts checked; {fixed} corrected.'))
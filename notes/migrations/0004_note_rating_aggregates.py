@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:16
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    # One set-based UPDATE: fill the running sum and star histogram of every note
+    Note = apps.get_model('notes', 'Note')
+    Rating = apps.get_model('notes', 'Rating')
+
+    def per_note(aggregate):
+        return Coalesce(
+            Subquery(
+                Rating.objects.filter(note=OuterRef('pk')).order_by()
+                .values('note').annotate(result=aggregate).values('result'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Note.objects.update(
+        rating_sum=per_note(Sum('value')),
+        **{f'rating_count_{i}': per_note(Count('id', filter=Q(value=i))) for i in range(1, 6)}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='rating_count_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='rating_count_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='rating_count_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='rating_count_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='rating_count_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_file_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='content_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='content_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
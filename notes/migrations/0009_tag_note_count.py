@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_note_counts(apps, schema_editor):
+    # One set-based UPDATE from the note/tag link table
+    Tag = apps.get_model('notes', 'Tag')
+    Through = apps.get_model('notes', 'Note').tags.through
+    Tag.objects.update(note_count=Coalesce(
+        Subquery(
+            Through.objects.filter(tag=OuterRef('pk')).order_by()
+            .values('tag').annotate(n=Count('id')).values('n'),
+            output_field=IntegerField(),
+        ),
+        0,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_note_content_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='note_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_note_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_category_path'),
+        ('notes', '0009_tag_note_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['category', '-created_at', '-id'], name='note_public_cat_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0003_category_note_counters'),
+        ('notes', '0010_note_category_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-updated_at'], name='note_public_updated_idx'),
+        ),
+    ]
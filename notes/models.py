@@ -1,10 +1,18 @@
-from django.db import models
+import os
+import uuid
+
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from categories.models import Category # Import the Category model
+from .storage import note_file_storage
 from django.urls import reverse
-from django.db.models import Avg
+from django.db.models import Avg, Case, Count, F, Q, Sum, FloatField, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
 from django.utils.text import slugify 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 # ---
 # TAG MODEL (Unchanged)
@@ -12,6 +20,9 @@ from django.utils.text import slugify
 class Tag(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
+    # Number of notes carrying this tag, kept up to date by notes.signals;
+    # ranks the autocomplete suggestions (see notes/tags.py)
+    note_count = models.IntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -30,7 +41,8 @@ class Tag(models.Model):
 class Note(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    file = models.FileField(upload_to='notes/', help_text="Upload your note (PDF, DOCX, PPT)")
+    # Stored content-addressed and deduplicated, see notes/storage.py
+    file = models.FileField(upload_to='notes/', storage=note_file_storage, help_text="Upload your note (PDF, DOCX, PPT)")
     
     # Relationships
     uploader = models.ForeignKey(
@@ -56,32 +68,202 @@ class Note(models.Model):
     average_rating = models.FloatField(default=0.0)
     total_ratings = models.IntegerField(default=0)
 
+    # Running rating aggregates, maintained incrementally by apply_rating_change()
+    rating_sum = models.IntegerField(default=0)
+    rating_count_1 = models.IntegerField(default=0)
+    rating_count_2 = models.IntegerField(default=0)
+    rating_count_3 = models.IntegerField(default=0)
+    rating_count_4 = models.IntegerField(default=0)
+    rating_count_5 = models.IntegerField(default=0)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # SHA-256 of the stored file's contents (empty if not known yet)
+    file_sha256 = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Plain text pulled out of the file for search (see notes/extraction.py),
+    # capped at NOTE_CONTENT_TEXT_MAX_CHARS. content_sha256 is the file hash
+    # it was extracted from, so unchanged files are never parsed twice.
+    content_text = models.TextField(blank=True, editable=False)
+    content_sha256 = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Full-text search document, maintained by notes.signals (see notes/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='note_search_vector_gin'),
+            # Keyset pagination: one index per list sort, with the id tiebreaker
+            models.Index(fields=['-created_at', '-id'], name='note_created_id_idx'),
+            models.Index(fields=['-average_rating', '-id'], name='note_rating_id_idx'),
+            models.Index(fields=['title', 'id'], name='note_title_id_idx'),
+            # Category pages: newest public notes of one category
+            models.Index(fields=['category', '-created_at', '-id'], name='note_public_cat_created_idx',
+                         condition=Q(is_public=True)),
+            # Latest change among public notes, the note list's page validator
+            models.Index(fields=['-updated_at'], name='note_public_updated_idx', condition=Q(is_public=True)),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def needs_text_extraction(self):
+        return bool(self.file_sha256) and self.file_sha256 != self.content_sha256
+
     def get_absolute_url(self):
         return reverse('notes:note-detail', kwargs={'pk': self.pk})
 
+    # Atomic, so the receivers that keep counters in step (e.g. the
+    # category note counts in notes.signals) commit or roll back with the row
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+    # Large columns that note cards never show; list pages and cached
+    # snapshots defer them
+    CARD_DEFERRED_FIELDS = ['content_text', 'search_vector']
+
+    # Fields written by the rating aggregate helpers below
+    RATING_FIELDS = [
+        'average_rating', 'total_ratings', 'rating_sum',
+        'rating_count_1', 'rating_count_2', 'rating_count_3', 'rating_count_4', 'rating_count_5',
+    ]
+
+    @property
+    def rating_histogram(self):
+        """
+        Star distribution as a list (5 stars first) of dicts with
+        'stars', 'count' and 'percent'. Read straight off the row, no query.
+        """
+        histogram = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'rating_count_{stars}')
+            percent = round(100 * count / self.total_ratings) if self.total_ratings else 0
+            histogram.append({'stars': stars, 'count': count, 'percent': percent})
+        return histogram
+
+    def apply_rating_change(self, old_value=None, new_value=None):
+        """
+        Incrementally updates the rating aggregates for one rating being
+        added (old_value=None), changed, or removed (new_value=None).
+
+        The row is updated with F() expressions, so concurrent voters never
+        overwrite each other. Call it inside the same transaction as the
+        Rating write. The refreshed values are loaded back onto `self`.
+        """
+        if old_value == new_value:
+            return
+
+        sum_delta = (new_value or 0) - (old_value or 0)
+        count_delta = (new_value is not None) - (old_value is not None)
+
+        self.rating_sum = F('rating_sum') + sum_delta
+        self.total_ratings = F('total_ratings') + count_delta
+        # In an UPDATE every F() still refers to the old row, so the average
+        # is computed from the old totals plus this change's deltas.
+        self.average_rating = Coalesce(
+            Cast(F('rating_sum') + sum_delta, FloatField())
+            / NullIf(F('total_ratings') + count_delta, Value(0)),
+            Value(0.0),
+        )
+        # Only the counters that change are written; saving the others would
+        # put back stale in-memory values over concurrent updates.
+        # updated_at too: it is the page validator (core/conditional.py)
+        changed = ['average_rating', 'total_ratings', 'rating_sum', 'updated_at']
+        if old_value is not None:
+            setattr(self, f'rating_count_{old_value}', F(f'rating_count_{old_value}') - 1)
+            changed.append(f'rating_count_{old_value}')
+        if new_value is not None:
+            setattr(self, f'rating_count_{new_value}', F(f'rating_count_{new_value}') + 1)
+            changed.append(f'rating_count_{new_value}')
+
+        self.save(update_fields=changed)
+        self.refresh_from_db(fields=self.RATING_FIELDS)
+
+    @classmethod
+    def apply_rating_changes(cls, changes):
+        """
+        apply_rating_change() for many notes in a single UPDATE. `changes`
+        is an iterable of (note_id, old_value, new_value). Like queryset
+        updates in general this sends no signals and reloads nothing.
+        """
+        sums, counts, stars = {}, {}, {value: {} for value in range(1, 6)}
+        for note_id, old_value, new_value in changes:
+            if old_value == new_value:
+                continue
+            sums[note_id] = sums.get(note_id, 0) + (new_value or 0) - (old_value or 0)
+            counts[note_id] = counts.get(note_id, 0) + (new_value is not None) - (old_value is not None)
+            if old_value is not None:
+                stars[old_value][note_id] = stars[old_value].get(note_id, 0) - 1
+            if new_value is not None:
+                stars[new_value][note_id] = stars[new_value].get(note_id, 0) + 1
+        if not sums:
+            return 0
+
+        def per_note(deltas):
+            return Case(*[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()], default=Value(0))
+
+        sum_delta, count_delta = per_note(sums), per_note(counts)
+        fields = {
+            'rating_sum': F('rating_sum') + sum_delta,
+            'total_ratings': F('total_ratings') + count_delta,
+            # Old totals plus the deltas, as in apply_rating_change()
+            'average_rating': Coalesce(
+                Cast(F('rating_sum') + sum_delta, FloatField())
+                / NullIf(F('total_ratings') + count_delta, Value(0)),
+                Value(0.0),
+            ),
+            # update() skips auto_now
+            'updated_at': timezone.now(),
+        }
+        for value, deltas in stars.items():
+            if any(deltas.values()):
+                fields[f'rating_count_{value}'] = F(f'rating_count_{value}') + per_note(deltas)
+        return cls.objects.filter(pk__in=sums).update(**fields)
+
+    def preview_rating_change(self, old_value=None, new_value=None):
+        """
+        Applies the same change as apply_rating_change() to this instance
+        only, without saving. Used to answer a vote right away while the
+        real update runs as a background job.
+        """
+        if old_value == new_value:
+            return
+        self.rating_sum += (new_value or 0) - (old_value or 0)
+        self.total_ratings += (new_value is not None) - (old_value is not None)
+        self.average_rating = self.rating_sum / self.total_ratings if self.total_ratings else 0.0
+        if old_value is not None:
+            setattr(self, f'rating_count_{old_value}', getattr(self, f'rating_count_{old_value}') - 1)
+        if new_value is not None:
+            setattr(self, f'rating_count_{new_value}', getattr(self, f'rating_count_{new_value}') + 1)
+
     def update_rating(self):
         """
-        Recalculates the average rating and total ratings for a note.
-        This is now called explicitly by RateNoteView or the seeder.
+        Recalculates all rating aggregates for a note from its Rating rows.
+        The normal voting path uses apply_rating_change(); this full
+        recompute is for the seeder and for repairing drifted rows.
         """
         ratings_data = self.ratings.aggregate(
             average=Avg('value'),
-            count=models.Count('id')
+            count=Count('id'),
+            total=Sum('value'),
+            **{f'stars_{i}': Count('id', filter=Q(value=i)) for i in range(1, 6)}
         )
         
         self.average_rating = ratings_data['average'] or 0.0
         self.total_ratings = ratings_data['count'] or 0
-        self.save()
+        self.rating_sum = ratings_data['total'] or 0
+        for i in range(1, 6):
+            setattr(self, f'rating_count_{i}', ratings_data[f'stars_{i}'])
+        self.save(update_fields=self.RATING_FIELDS + ['updated_at'])
 
 # ---
 # RATING MODEL (MODIFIED)
@@ -99,6 +281,72 @@ class Rating(models.Model):
     def __str__(self):
         return f"{self.user.username} rated {self.note.title} with {self.value} stars"
 
+    @staticmethod
+    def reputation_for(value):
+        """Reputation the uploader earns from a single rating of `value` (0 for none)."""
+        if value is None:
+            return 0
+        if value >= 4:
+            return 5
+        if value <= 2:
+            return -2
+        return 0
+
     # --- REMOVED `save` and `delete` methods ---
     # We will handle the note update from the view
-    # to prevent the bug.
\ No newline at end of file
+    # to prevent the bug.
+
+
+# ---
+# CONTENT-ADDRESSED FILE BLOB
+# ---
+class FileBlob(models.Model):
+    """
+    One unique stored file and the number of references to it.
+    Maintained by notes.storage.ContentAddressedStorage.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} (x{self.refcount})"
+
+
+# ---
+# CHUNKED UPLOAD SESSION
+# ---
+class UploadSession(models.Model):
+    """
+    A resumable upload in progress (see notes/uploads.py). Chunks are
+    appended to a temp file under CHUNKED_UPLOAD_DIR; once `offset`
+    reaches `size` the upload is complete and can be attached to a Note
+    through NoteForm's `upload_id` field.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.pk}.part')
@@ -0,0 +1,187 @@
+import base64
+import json
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+# ---
+# KEYSET (CURSOR) PAGINATION
+# ---
+# Instead of OFFSET + COUNT(*), each page is fetched with a WHERE clause
+# that continues right after the last row of the previous page, following
+# the active ORDER BY plus a primary-key tiebreaker. Deep pages cost the
+# same as the first one. Cursors are opaque url-safe strings.
+
+
+def _json_default(value):
+    # Full precision (DjangoJSONEncoder would drop microseconds)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': int(reverse)}, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _cursor_value(field, value):
+    if value is None or isinstance(value, (list, dict)):
+        raise ValueError(value)
+    return field.to_python(value)
+
+
+def decode_cursor(cursor, fields):
+    """
+    Returns (values, reverse) of a cursor, each value converted with the
+    model field it sorts on (`fields`, in ordering order). Cursors come
+    from the URL, so anything that doesn't decode or doesn't fit those
+    fields is a 404 rather than an error in the query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError(values)
+        return [_cursor_value(field, value) for field, value in zip(fields, values)], bool(payload['r'])
+    except (ValueError, TypeError, KeyError, ValidationError):
+        raise Http404("Invalid page cursor.")
+
+
+class CursorPage:
+    """A page of results plus the cursors for the neighbouring pages."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginates an ordered queryset by keyset. The ordering is taken from the
+    queryset (or the model's Meta.ordering) and gets 'pk' appended as a
+    tiebreaker so every row has a unique position.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            last_desc = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-pk' if last_desc else 'pk')
+        self.ordering = ordering
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _fields(self):
+        """The model field (or annotation output field) behind each ordering column."""
+        query, meta = self.queryset.query, self.queryset.model._meta
+        fields = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if name in query.annotations:
+                fields.append(query.annotations[name].output_field)
+            else:
+                fields.append(meta.pk if name == 'pk' else meta.get_field(name))
+        return fields
+
+    def _position(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _after(self, values, reverse):
+        """
+        Q for rows strictly after `values` in the (possibly reversed) ordering:
+            (a > x) OR (a = x AND b > y) OR ...
+        A plain bound on the first column is added in front so the index on
+        it can be range-scanned.
+        """
+        keyset = Q()
+        equal_so_far = Q()
+        for field, value in zip(self.ordering, values):
+            descending = field.startswith('-') != reverse
+            name = field.lstrip('-')
+            keyset |= equal_so_far & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal_so_far &= Q(**{name: value})
+
+        first = self.ordering[0]
+        first_descending = first.startswith('-') != reverse
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first_descending else 'gte'}": values[0]}) & keyset
+
+    def _page_query(self, cursor):
+        values, reverse = decode_cursor(cursor, self._fields()) if cursor else (None, False)
+
+        ordering = [self._flip(field) for field in self.ordering] if reverse else self.ordering
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        # One extra row tells us whether there is anything beyond this page
+        return queryset[:self.per_page + 1], values, reverse
+
+    def page(self, cursor=None):
+        queryset, values, reverse = self._page_query(cursor)
+        return self._make_page(list(queryset), values, reverse)
+
+    async def apage(self, cursor=None):
+        queryset, values, reverse = self._page_query(cursor)
+        return self._make_page([row async for row in queryset], values, reverse)
+
+    def _make_page(self, rows, values, reverse):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = encode_cursor(self._position(rows[-1])) if rows and has_next else None
+        previous_cursor = encode_cursor(self._position(rows[0]), reverse=True) if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin that paginates with ?cursor=... instead of ?page=N.
+    Old ?page=N links still go through Django's regular paginator.
+    """
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """paginate_queryset() for async views."""
+        if self.page_kwarg in self.request.GET:
+            return await sync_to_async(super().paginate_queryset)(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
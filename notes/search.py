@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db.models import OuterRef, Subquery
+
+from categories.models import Category
+
+# ---
+# STORED SEARCH VECTOR
+# ---
+# The weights mirror the old per-query SearchVector in NoteListView:
+#   A = title, tags   B = description, category   C = uploader's names
+#   D = text extracted from the file itself (notes/extraction.py)
+# Everything that lives in another table is pulled in through a correlated
+# subquery, so the whole vector can be written with a single UPDATE ... SET.
+
+
+def search_vector_expression():
+    """
+    Builds the weighted tsvector expression for a Note row.
+    Only usable inside Note.objects.update(), since it references OuterRef('pk').
+    """
+    from .models import Tag
+
+    tag_names = Subquery(
+        Tag.objects.filter(notes=OuterRef('pk'))
+        .order_by()
+        .values('notes')
+        .annotate(names=StringAgg('name', delimiter=' '))
+        .values('names')
+    )
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1]
+    )
+    uploader = get_user_model().objects.filter(pk=OuterRef('uploader_id'))
+
+    return (
+        SearchVector('title', weight='A')
+        + SearchVector(tag_names, weight='A')
+        + SearchVector('description', weight='B')
+        + SearchVector(category_name, weight='B')
+        + SearchVector(Subquery(uploader.values('first_name')[:1]), weight='C')
+        + SearchVector(Subquery(uploader.values('last_name')[:1]), weight='C')
+        + SearchVector('content_text', weight='D')
+    )
+
+
+def update_search_vectors(queryset, **fields):
+    """
+    Recomputes `search_vector` for every note in the queryset in one statement
+    (along with any extra `fields` given). Returns the number of rows updated.
+    """
+    return queryset.order_by().update(search_vector=search_vector_expression(), **fields)
@@ -0,0 +1,203 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from categories.counters import adjust_note_counts
+from categories.models import Category
+from core.pagecache import purge_notes
+from core.queue import enqueue
+from .models import Note, Tag
+from .search import update_search_vectors
+from .tags import invalidate_tag_cache
+
+# Note fields that feed the stored search vector
+SEARCH_FIELDS = {'title', 'description', 'category', 'uploader'}
+USER_SEARCH_FIELDS = {'first_name', 'last_name'}
+# User fields shown on note cards ("By <first name or username>")
+USER_DISPLAY_FIELDS = USER_SEARCH_FIELDS | {'username'}
+FILE_FIELDS = {'file', 'file_sha256'}
+# Note fields that decide which category counters a note counts towards
+COUNTED_FIELDS = {'category', 'is_public'}
+
+
+def _touches(update_fields, fields):
+    # A plain save() (update_fields=None) may have changed anything
+    return update_fields is None or bool(fields.intersection(update_fields))
+
+
+def _related_data_changed(notes):
+    """
+    For notes whose tags, category or uploader changed: rebuilds their
+    search vectors and bumps updated_at, which versions their cached cards
+    (see note_list.html), in one UPDATE, and purges the guest pages showing them.
+    """
+    purge_notes(notes)
+    update_search_vectors(notes, updated_at=timezone.now())
+
+
+# ---
+# SEARCH VECTOR MAINTENANCE
+# ---
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, SEARCH_FIELDS):
+        return
+    update_search_vectors(Note.objects.filter(pk=instance.pk))
+
+
+# ---
+# FILE TEXT EXTRACTION
+# ---
+@receiver(post_save, sender=Note)
+def note_file_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not settings.NOTE_EXTRACTION_WORKERS or not _touches(update_fields, FILE_FIELDS):
+        return
+    if instance.needs_text_extraction:
+        # Queued in the same transaction as the note itself
+        enqueue('notes.extract_text', note_id=instance.pk)
+
+
+# ---
+# TAGS, CATEGORY AND UPLOADER SHOWN WITH A NOTE
+# ---
+# Changes to them don't save the note, so its search vector and card
+# version are refreshed here.
+@receiver(m2m_changed, sender=Note.tags.through)
+def note_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # note.tags.add/remove/set/clear()
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _related_data_changed(Note.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        # tag.notes.clear() gives no pk_set, so remember the notes beforehand
+        instance._search_note_ids = list(instance.notes.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        _related_data_changed(Note.objects.filter(pk__in=getattr(instance, '_search_note_ids', [])))
+    elif action in ('post_add', 'post_remove'):
+        _related_data_changed(Note.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    _related_data_changed(Note.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    _related_data_changed(Note.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def uploader_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created or not _touches(update_fields, USER_DISPLAY_FIELDS):
+        return
+    _related_data_changed(Note.objects.filter(uploader=instance))
+
+
+# Deleting a tag or category drops it from notes without any Note/m2m signal,
+# so remember the affected notes before the delete and refresh them after.
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Category)
+def search_source_pre_delete(sender, instance, **kwargs):
+    instance._search_note_ids = list(instance.notes.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+def search_source_deleted(sender, instance, **kwargs):
+    note_ids = getattr(instance, '_search_note_ids', None)
+    if note_ids:
+        _related_data_changed(Note.objects.filter(pk__in=note_ids))
+
+
+# ---
+# TAG NAME CACHE (notes/tags.py)
+# ---
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    invalidate_tag_cache()
+
+
+# ---
+# TAG USAGE COUNTS (Tag.note_count)
+# ---
+def _bump_tags(tag_ids, delta):
+    if tag_ids and delta:
+        Tag.objects.filter(pk__in=tag_ids).update(note_count=F('note_count') + delta)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def tag_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    sign = {'post_add': 1, 'post_remove': -1}.get(action)
+    if action == 'pre_clear':
+        # clear() gives no pk_set, so count the links before they go
+        if reverse:
+            instance._count_cleared = instance.notes.count()
+        else:
+            instance._count_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        if reverse:
+            _bump_tags([instance.pk], -getattr(instance, '_count_cleared', 0))
+        else:
+            _bump_tags(getattr(instance, '_count_tag_ids', []), -1)
+    elif sign and pk_set:
+        if reverse:
+            _bump_tags([instance.pk], sign * len(pk_set))
+        else:
+            _bump_tags(pk_set, sign)
+
+
+# Deleting a note removes its tag links without any m2m signal
+@receiver(pre_delete, sender=Note)
+def note_pre_delete_tags(sender, instance, **kwargs):
+    instance._count_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted_tags(sender, instance, **kwargs):
+    _bump_tags(getattr(instance, '_count_tag_ids', []), -1)
+
+
+# ---
+# CATEGORY NOTE COUNTERS (categories/counters.py)
+# ---
+@receiver(pre_save, sender=Note)
+def note_pre_save_counts(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._counted_before = None
+    if raw or instance._state.adding or not _touches(update_fields, COUNTED_FIELDS):
+        return
+    # What the row says now, not what this instance was loaded with. Locked
+    # (Note.save() is atomic): two concurrent edits would otherwise both see
+    # the same "before" and both apply the move
+    instance._counted_before = (
+        Note.objects.select_for_update().filter(pk=instance.pk).values_list('category_id', 'is_public').first()
+    )
+
+
+@receiver(post_save, sender=Note)
+def note_saved_counts(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or not (created or _touches(update_fields, COUNTED_FIELDS)):
+        return
+    before = None if created else getattr(instance, '_counted_before', None)
+    after = (instance.category_id, instance.is_public)
+    if before == after:
+        return
+    if before and before[0] == after[0]:
+        # Same category, only the visibility changed
+        adjust_note_counts(after[0], 0, 1 if after[1] else -1)
+        return
+    if before:
+        adjust_note_counts(before[0], -1, -1 if before[1] else 0)
+    adjust_note_counts(after[0], 1, 1 if after[1] else 0)
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted_counts(sender, instance, **kwargs):
+    adjust_note_counts(instance.category_id, -1, -1 if instance.is_public else 0)
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+# ---
+# CONTENT-ADDRESSED NOTE STORAGE
+# ---
+# Note files are stored once per unique content, under
+#     <upload_to>/<first two hex digits>/<sha256><extension>
+# e.g. notes/3f/3f9a...e1.pdf. Each FileBlob row counts how many stored
+# references point at a blob: every save() adds one and every delete()
+# (which is what django_cleanup calls when a note is deleted or its file
+# replaced) drops one. The bytes are removed when the last reference goes.
+
+BLOB_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})(?:\.[^/]*)?$')
+HASH_BLOCK_SIZE = 64 * 1024
+
+
+def blob_sha256(name):
+    """The content hash encoded in a blob name, or None for other names."""
+    match = BLOB_NAME_RE.search(name or '')
+    return match.group('sha256') if match else None
+
+
+def blob_name(prefix, sha256, extension):
+    return '/'.join(part for part in (prefix, sha256[:2], f'{sha256}{extension.lower()}') if part)
+
+
+def hash_content(content):
+    """SHA-256 of a Django File, leaving it rewound for the actual write."""
+    # Chunked uploads (notes.uploads.AssembledUpload) already know their hash
+    known = getattr(content, 'sha256', None)
+    if known:
+        return known
+    hasher = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_BLOCK_SIZE):
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def __init__(self, **kwargs):
+        # Two writers racing on the same new blob write identical bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(), and
+        # identical content is supposed to land on the same name.
+        return name
+
+    def _save(self, name, content):
+        from .models import FileBlob
+
+        sha256 = hash_content(content)
+        directory, filename = os.path.split(name)
+        target = blob_name(directory, sha256, os.path.splitext(filename)[1])
+
+        with transaction.atomic():
+            # Take the reference first (under a row lock), then make sure the
+            # bytes exist, so a concurrent delete can't remove them under us.
+            updated = FileBlob.objects.filter(name=target).update(refcount=F('refcount') + 1)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        FileBlob.objects.create(name=target, sha256=sha256, size=content.size, refcount=1)
+                except IntegrityError:
+                    FileBlob.objects.filter(name=target).update(refcount=F('refcount') + 1)
+            if not super().exists(target):
+                super()._save(target, content)
+        return target
+
+    def delete(self, name):
+        from .models import FileBlob
+
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Not a tracked blob (e.g. a file from before deduplication)
+                return super().delete(name)
+            if blob.refcount > 1:
+                FileBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+note_file_storage = ContentAddressedStorage()
@@ -0,0 +1,184 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.utils.text import slugify
+
+from .models import Note, Tag
+
+# ---
+# BULK TAG RESOLUTION
+# ---
+# Turning a list of tag names into tag ids costs a constant number of
+# queries however many tags there are: one IN lookup for names not in the
+# cache, one INSERT ... ON CONFLICT DO NOTHING for the missing ones, and one
+# more lookup for what that insert created (or lost to a concurrent writer).
+#
+# Name -> id pairs are kept in a small per-process LRU cache. It's cleared
+# whenever a Tag is saved or deleted in this process (notes.signals). Ids
+# taken from it are checked with one IN lookup before use: a tag deleted by
+# another process would otherwise only fail the deferred foreign key check
+# at COMMIT, after every m2m_changed receiver has run.
+
+WHITESPACE_RE = re.compile(r'\s+')
+NAME_MAX_LENGTH = Tag._meta.get_field('name').max_length
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def normalize_tag_names(names):
+    """Lowercases, trims and de-duplicates tag names, keeping their order."""
+    seen = {}
+    for name in names:
+        name = WHITESPACE_RE.sub(' ', str(name)).strip().lower()[:NAME_MAX_LENGTH].strip()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def _cache_get(names):
+    found = {}
+    with _cache_lock:
+        for name in names:
+            tag_id = _cache.get(name)
+            if tag_id is not None:
+                _cache.move_to_end(name)
+                found[name] = tag_id
+    return found
+
+
+def _cache_put(pairs):
+    with _cache_lock:
+        for name, tag_id in pairs.items():
+            _cache[name] = tag_id
+            _cache.move_to_end(name)
+        while len(_cache) > settings.TAG_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _cache_discard(names):
+    with _cache_lock:
+        for name in names:
+            _cache.pop(name, None)
+
+
+def invalidate_tag_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _unique_slug(name):
+    base = slugify(name)[:90] or 'tag'
+    slug, n = base, 1
+    while Tag.objects.filter(slug=slug).exists():
+        n += 1
+        slug = f'{base}-{n}'
+    return slug
+
+
+def resolve_tag_ids(names):
+    """
+    Returns {name: tag_id} for already-normalized `names`, creating the
+    tags that don't exist yet.
+    """
+    ids = _cache_get(names)
+    if ids:
+        live = set(Tag.objects.filter(pk__in=ids.values()).values_list('pk', flat=True))
+        stale = [name for name, tag_id in ids.items() if tag_id not in live]
+        if stale:
+            # Deleted by another process: looked up again by name below
+            _cache_discard(stale)
+            ids = {name: tag_id for name, tag_id in ids.items() if tag_id in live}
+    missing = [name for name in names if name not in ids]
+    if not missing:
+        return ids
+
+    existing = dict(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+    ids.update(existing)
+    # Only committed rows go into the cache; tags created below are added
+    # once the surrounding transaction commits.
+    _cache_put(existing)
+
+    to_create = [name for name in missing if name not in existing]
+    if to_create:
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slugify(name)) for name in to_create],
+            ignore_conflicts=True,
+        )
+        created = dict(Tag.objects.filter(name__in=to_create).values_list('name', 'id'))
+        # Different names can share a slug ("c++" and "c"); those rows were
+        # skipped by ON CONFLICT and are created one by one with a free slug.
+        for name in to_create:
+            if name not in created:
+                with transaction.atomic():
+                    tag, _ = Tag.objects.get_or_create(name=name, defaults={'slug': _unique_slug(name)})
+                created[name] = tag.pk
+        ids.update(created)
+        transaction.on_commit(lambda: _cache_put(created))
+    return ids
+
+
+def set_note_tags(note, names):
+    """
+    Replaces the tags of a saved note with the tags named `names`.
+
+    The through-table rows are written directly (one DELETE, one bulk
+    INSERT), and m2m_changed is sent for what actually changed, so
+    receivers such as the search-vector maintenance see the same events
+    as with note.tags.set().
+    """
+    names = normalize_tag_names(names)
+    with transaction.atomic():
+        _write_note_tags(note, resolve_tag_ids(names))
+
+
+def _write_note_tags(note, ids):
+    through = Note.tags.through
+    wanted = set(ids.values())
+    current = set(through.objects.filter(note_id=note.pk).values_list('tag_id', flat=True))
+    to_remove = current - wanted
+    to_add = wanted - current
+
+    signal_kwargs = {'sender': through, 'instance': note, 'reverse': False, 'model': Tag, 'using': note._state.db}
+    if to_remove:
+        m2m_changed.send(action='pre_remove', pk_set=to_remove, **signal_kwargs)
+        through.objects.filter(note_id=note.pk, tag_id__in=to_remove).delete()
+        m2m_changed.send(action='post_remove', pk_set=to_remove, **signal_kwargs)
+    if to_add:
+        m2m_changed.send(action='pre_add', pk_set=to_add, **signal_kwargs)
+        through.objects.bulk_create(
+            [through(note_id=note.pk, tag_id=tag_id) for tag_id in to_add],
+            ignore_conflicts=True,
+        )
+        m2m_changed.send(action='post_add', pk_set=to_add, **signal_kwargs)
+
+
+# ---
+# AUTOCOMPLETE
+# ---
+# Prefix match on the varchar_pattern_ops index PostgreSQL gets for the
+# unique Tag.name (Django adds a "_like" index to it), ranked by the stored
+# Tag.note_count. Answers are cached for a short time since the same
+# prefixes are typed over and over; counts being a minute stale is fine.
+
+def autocomplete_tags(prefix, limit):
+    """Top `limit` tags starting with `prefix`, most used first, as plain dicts."""
+    prefix = (normalize_tag_names([prefix]) or [''])[0]
+    digest = hashlib.md5(prefix.encode()).hexdigest()
+    key = f'tag-autocomplete:{limit}:{digest}'
+    results = cache.get(key)
+    if results is None:
+        queryset = Tag.objects.all()
+        if prefix:
+            queryset = queryset.filter(name__startswith=prefix)
+        results = list(
+            queryset.order_by('-note_count', 'name').values('name', 'slug', 'note_count')[:limit]
+        )
+        cache.set(key, results, settings.TAG_AUTOCOMPLETE_CACHE_TIMEOUT)
+    return results
@@ -0,0 +1,584 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from categories.counters import actual_counts
+from categories.models import Category
+from categories.tree import invalidate_category_tree
+from core.dashboard import build_dashboard_snapshot
+from core.models import Job, ReputationEvent, User
+from core.queue import claim, run_job
+from core.query_inspector import QueryInspectionError
+from notes import extraction, jobs, tags, uploads
+from notes.models import FileBlob, Note, Rating, Tag
+from notes.pagination import encode_cursor
+from notes.storage import blob_sha256, note_file_storage
+from notes.tags import set_note_tags
+from notes.views import NoteListView
+
+# ---
+# QUERY BUDGETS
+# ---
+# Requests every view that declares a query_budget with the inspector in
+# 'raise' mode (core/query_inspector.py), so going over a budget or
+# bringing back an N+1 pattern fails the suite. Caches are emptied before
+# each test: budgets must hold with cold caches. The fixture has more rows
+# per page than QUERY_INSPECTOR_REPEAT_THRESHOLD, so per-row queries show.
+
+
+@override_settings(QUERY_INSPECTOR='raise')
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Signal receivers that run on commit (search vectors, tree version) run here too
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.uploader = User.objects.create_user('uploader', password='pw', role='teacher')
+            cls.voter = User.objects.create_user('voter', password='pw')
+            cls.root = Category.objects.create(name='Science')
+            cls.topics = [Category.objects.create(name=f'Topic {i}', parent=cls.root) for i in range(6)]
+            Category.objects.create(name='Subtopic', parent=cls.topics[0])
+
+            cls.notes = []
+            for i in range(14):
+                note = Note.objects.create(
+                    title=f'Algebra notes {i}', description='Groups, rings and fields',
+                    file=f'notes/00/{i:064x}.pdf', uploader=cls.uploader,
+                    category=cls.topics[i % len(cls.topics)], is_public=i != 13,
+                )
+                set_note_tags(note, ['algebra', f'week {i % 3}'])
+                cls.notes.append(note)
+            for note in cls.notes[:6]:
+                Rating.objects.create(note=note, user=cls.voter, value=4)
+                note.update_rating()
+
+    def setUp(self):
+        cache.clear()
+        invalidate_category_tree()
+
+    def get(self, name, *args, params=None):
+        response = self.client.get(reverse(name, args=args), params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_note_list(self):
+        for params in [None, {'sort': 'title'}, {'sort': '-average_rating'}, {'category': self.topics[0].pk}, {'q': 'algebra'}]:
+            self.get('notes:note-list', params=params)
+        self.client.force_login(self.voter)
+        self.get('notes:note-list')
+        self.get('notes:note-search', params={'q': 'algebra'})
+
+    def test_note_detail(self):
+        self.get('notes:note-detail', self.notes[0].pk)
+        self.client.force_login(self.voter)
+        self.get('notes:note-detail', self.notes[0].pk)
+
+    def test_my_notes(self):
+        self.client.force_login(self.uploader)
+        self.get('notes:my-notes')
+
+    def test_rate_note(self):
+        self.client.force_login(self.voter)
+        for note in self.notes[5:7]:
+            response = self.client.post(reverse('notes:note-rate', args=[note.pk]), {'rating': 5}, secure=True)
+            self.assertEqual(response.status_code, 200)
+
+    def test_batch_ratings(self):
+        self.client.force_login(self.voter)
+        ids = [note.pk for note in self.notes[:10]]
+        self.get('notes:rating-batch', params={'ids': ','.join(map(str, ids))})
+        response = self.client.post(
+            reverse('notes:rating-batch'),
+            json.dumps({'ratings': [{'note_id': pk, 'value': 3} for pk in ids]}),
+            content_type='application/json', secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['notes']), {str(pk) for pk in ids})
+
+    def test_categories(self):
+        self.get('categories:category-list')
+        # Lists the sub-categories with their counts: no query per child
+        self.get('categories:category-detail', self.root.pk)
+        self.get('categories:category-detail', self.topics[0].pk)
+
+    def test_dashboard(self):
+        self.client.force_login(self.voter)
+        self.get('dashboard')
+
+    def test_over_budget_fails(self):
+        with mock.patch.object(NoteListView, 'query_budget', 1):
+            with self.assertRaises(QueryInspectionError):
+                self.get('notes:note-list')
+
+
+class TempMediaMixin:
+    """Stores note files and upload chunks under a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media_root, CHUNKED_UPLOAD_DIR=os.path.join(media_root, 'upload_chunks'),
+        ))
+
+
+# ---
+# KEYSET PAGINATION
+# ---
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        uploader = User.objects.create_user('uploader', password='pw', role='teacher')
+        cls.notes = [
+            Note.objects.create(title=f'Algebra notes {i}', file=f'notes/00/{i:064x}.pdf', uploader=uploader)
+            for i in range(14)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_list(self, **params):
+        return self.client.get(reverse('notes:note-list'), params, secure=True)
+
+    def test_pages_follow_on(self):
+        first = self.get_list().context['page_obj']
+        second = self.get_list(cursor=first.next_cursor).context['page_obj']
+        self.assertEqual(len(first), 12)
+        self.assertEqual(len(second), 2)
+        self.assertEqual({note.pk for note in [*first, *second]}, {note.pk for note in self.notes})
+        self.assertIsNone(second.next_cursor)
+
+        back = self.get_list(cursor=second.previous_cursor).context['page_obj']
+        self.assertEqual([note.pk for note in back], [note.pk for note in first])
+
+    def test_tampered_cursor_is_404(self):
+        created_at = self.notes[0].created_at
+        for cursor in [
+            'not a cursor',
+            encode_cursor({'created_at': created_at}),
+            encode_cursor(['yesterday', self.notes[0].pk]),
+            encode_cursor([created_at, 'first']),
+            encode_cursor([created_at, None]),
+            encode_cursor([created_at, [1]]),
+            encode_cursor([created_at]),
+        ]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get_list(cursor=cursor).status_code, 404)
+
+        self.assertEqual(self.get_list(sort='-average_rating', cursor=encode_cursor(['high', 1])).status_code, 404)
+        self.assertEqual(self.get_list(q='algebra', cursor=encode_cursor(['high', 1])).status_code, 404)
+
+
+# ---
+# CHUNKED UPLOADS
+# ---
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+    # Three stream blocks and a bit, so chunks are read in several pieces
+    PAYLOAD = bytes(range(256)) * 800
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('uploader', password='pw', role='teacher')
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('notes:upload-start'), json.dumps({'filename': 'week1.pdf', 'size': len(self.PAYLOAD)}),
+            content_type='application/json', secure=True,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.upload_id = response.json()['upload_id']
+
+    def put_chunk(self, offset, data):
+        return self.client.put(
+            reverse('notes:upload-chunk', args=[self.upload_id]), data,
+            content_type='application/octet-stream', headers={'Upload-Offset': str(offset)}, secure=True,
+        )
+
+    def test_resume_after_rejected_chunk(self):
+        half = len(self.PAYLOAD) // 2
+        self.assertEqual(self.put_chunk(0, self.PAYLOAD[:half]).status_code, 200)
+        # Too large: the first blocks are written to the temp file before
+        # the overflow is noticed, and the in-memory hash is lost
+        self.assertEqual(self.put_chunk(half, self.PAYLOAD[half:] + b'x' * 1000).status_code, 413)
+        self.assertEqual(self.client.get(reverse('notes:upload-chunk', args=[self.upload_id]), secure=True).json()['offset'], half)
+
+        response = self.put_chunk(half, self.PAYLOAD[half:])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['complete'])
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(self.PAYLOAD).hexdigest())
+
+    def test_resume_on_another_worker(self):
+        half = len(self.PAYLOAD) // 2
+        self.put_chunk(0, self.PAYLOAD[:half])
+        # As if the next chunk reached a process without the running hash
+        uploads._hashers.clear()
+        response = self.put_chunk(half, self.PAYLOAD[half:])
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(self.PAYLOAD).hexdigest())
+
+    def test_offset_mismatch(self):
+        response = self.put_chunk(10, self.PAYLOAD[10:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 0)
+
+    def test_attach_finished_upload(self):
+        self.put_chunk(0, self.PAYLOAD)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notes:note-create'), {
+                'title': 'Week 1', 'description': '', 'tags': '', 'upload_id': self.upload_id,
+            }, secure=True)
+        self.assertEqual(response.status_code, 302)
+        note = Note.objects.get()
+        self.assertEqual(note.file_sha256, hashlib.sha256(self.PAYLOAD).hexdigest())
+        with note.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.PAYLOAD)
+
+
+# ---
+# CONTENT-ADDRESSED FILES
+# ---
+class NoteFileTests(TempMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('uploader', password='pw', role='teacher')
+        self.client.force_login(self.user)
+
+    def post_note(self, url, content=None, **data):
+        data = {'title': 'Week 1', 'description': '', 'is_public': 'on', 'tags': '', **data}
+        if content is not None:
+            data['file'] = SimpleUploadedFile('week1.pdf', content, content_type='application/pdf')
+        # django_cleanup releases replaced files on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, secure=True)
+        self.assertEqual(response.status_code, 302)
+
+    def create_note(self, content, **data):
+        self.post_note(reverse('notes:note-create'), content, **data)
+        return Note.objects.latest('pk')
+
+    def edit_note(self, note, content=None, **data):
+        self.post_note(reverse('notes:note-edit', args=[note.pk]), content, **data)
+        note.refresh_from_db()
+        return note
+
+    def assertStored(self, name, refcount):
+        self.assertEqual(FileBlob.objects.get(name=name).refcount, refcount)
+        self.assertTrue(note_file_storage.exists(name))
+
+    def test_edit_without_new_file_keeps_blob(self):
+        note = self.create_note(b'%PDF week one')
+        note = self.edit_note(note, title='Week 1 (revised)')
+        self.assertEqual(note.title, 'Week 1 (revised)')
+        self.assertStored(note.file.name, 1)
+
+    def test_reupload_same_content_keeps_one_reference(self):
+        note = self.create_note(b'%PDF week one')
+        name = note.file.name
+        note = self.edit_note(note, b'%PDF week one')
+        self.assertEqual(note.file.name, name)
+        self.assertStored(name, 1)
+
+    def test_reupload_new_content_releases_old_blob(self):
+        note = self.create_note(b'%PDF week one')
+        old_name = note.file.name
+        note = self.edit_note(note, b'%PDF week two')
+        self.assertStored(note.file.name, 1)
+        self.assertFalse(FileBlob.objects.filter(name=old_name).exists())
+        self.assertFalse(note_file_storage.exists(old_name))
+
+    def test_identical_files_share_one_blob(self):
+        first = self.create_note(b'%PDF shared')
+        second = self.create_note(b'%PDF shared', title='Week 1 again')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.file_sha256, hashlib.sha256(b'%PDF shared').hexdigest())
+        self.assertStored(first.file.name, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertStored(second.file.name, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(note_file_storage.exists(second.file.name))
+
+
+# ---
+# TEXT EXTRACTION
+# ---
+class TextExtractionTests(TempMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('uploader', password='pw', role='teacher')
+        self.note = Note.objects.create(
+            title='Week 1', uploader=user, file=SimpleUploadedFile('week1.pdf', b'%PDF week one'),
+        )
+        Note.objects.filter(pk=self.note.pk).update(file_sha256=blob_sha256(self.note.file.name))
+
+    def run_job(self, pages):
+        with ThreadPoolExecutor(1) as pool, mock.patch.object(jobs, 'get_pool', return_value=pool), \
+                mock.patch.dict(extraction.EXTRACTORS, {'.pdf': pages}):
+            jobs.extract_text(self.note.pk)
+        self.note.refresh_from_db()
+
+    def test_extracted_text_is_stored(self):
+        self.run_job(lambda path: iter(['Group theory', 'Rings']))
+        self.assertEqual(self.note.content_text, 'Group theory\nRings')
+        self.assertFalse(self.note.needs_text_extraction)
+
+    def test_failed_parse_is_retried(self):
+        def unreadable(path):
+            raise OSError('truncated file')
+            yield
+
+        with self.assertRaises(RuntimeError), self.assertLogs('notes.extraction', 'ERROR'):
+            self.run_job(unreadable)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content_sha256, '')
+        self.assertTrue(self.note.needs_text_extraction)
+
+    def test_cards_defer_large_columns(self):
+        snapshot = build_dashboard_snapshot()
+        for note in snapshot['recent_notes'] + snapshot['top_notes']:
+            self.assertTrue(set(Note.CARD_DEFERRED_FIELDS) <= note.get_deferred_fields())
+
+
+# ---
+# TAGS
+# ---
+class NoteTagTests(TestCase):
+
+    def setUp(self):
+        tags.invalidate_tag_cache()
+        self.user = User.objects.create_user('uploader', password='pw', role='teacher')
+        self.notes = [
+            Note.objects.create(title=f'Week {i}', file=f'notes/00/{i:064x}.pdf', uploader=self.user)
+            for i in range(2)
+        ]
+
+    def tag_counts(self):
+        return dict(Tag.objects.values_list('name', 'note_count'))
+
+    def test_names_are_normalized(self):
+        set_note_tags(self.notes[0], ['Linear  Algebra', ' linear algebra', 'DSA', ''])
+        self.assertEqual(sorted(self.notes[0].tags.values_list('name', flat=True)), ['dsa', 'linear algebra'])
+
+    def test_query_count_does_not_grow_with_tags(self):
+        with CaptureQueriesContext(connection) as few:
+            set_note_tags(self.notes[0], [f'topic {i}' for i in range(2)])
+        with CaptureQueriesContext(connection) as many:
+            set_note_tags(self.notes[1], [f'subject {i}' for i in range(10)])
+        self.assertEqual(len(few), len(many))
+
+    def test_counts_follow_links(self):
+        set_note_tags(self.notes[0], ['algebra', 'sets'])
+        set_note_tags(self.notes[1], ['algebra'])
+        self.assertEqual(self.tag_counts(), {'algebra': 2, 'sets': 1})
+
+        set_note_tags(self.notes[0], ['sets', 'groups'])
+        self.assertEqual(self.tag_counts(), {'algebra': 1, 'sets': 1, 'groups': 1})
+
+        self.notes[1].tags.clear()
+        self.notes[0].delete()
+        self.assertEqual(self.tag_counts(), {'algebra': 0, 'sets': 0, 'groups': 0})
+
+    def test_stale_cached_id_is_resolved_again(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            set_note_tags(self.notes[0], ['algebra'])
+        deleted = Tag.objects.get(name='algebra')
+        # As if another process deleted the tag: this process's cache still has it
+        Tag.objects.filter(pk=deleted.pk).delete()
+        tags._cache_put({'algebra': deleted.pk})
+
+        set_note_tags(self.notes[1], ['algebra'])
+        tag = self.notes[1].tags.get()
+        self.assertEqual(tag.name, 'algebra')
+        self.assertNotEqual(tag.pk, deleted.pk)
+
+    def test_names_sharing_a_slug(self):
+        set_note_tags(self.notes[0], ['c', 'c++'])
+        self.assertEqual(sorted(Tag.objects.values_list('slug', flat=True)), ['c', 'c-2'])
+        self.assertEqual(self.notes[0].tags.count(), 2)
+
+
+# ---
+# CATEGORY NOTE COUNTERS
+# ---
+class CategoryCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='pw', role='teacher')
+        self.root = Category.objects.create(name='Science')
+        self.maths = Category.objects.create(name='Maths', parent=self.root)
+        self.algebra = Category.objects.create(name='Algebra', parent=self.maths)
+        self.physics = Category.objects.create(name='Physics', parent=self.root)
+        self.note = self.create_note(self.algebra)
+        self.create_note(self.physics, is_public=False)
+
+    def create_note(self, category, is_public=True):
+        return Note.objects.create(
+            title='Week 1', file='notes/00/week1.pdf', uploader=self.user, category=category, is_public=is_public,
+        )
+
+    def assertCounts(self, category, note_count, public_note_count, subtree_public_count):
+        category.refresh_from_db()
+        self.assertEqual(
+            (category.note_count, category.public_note_count, category.subtree_public_count),
+            (note_count, public_note_count, subtree_public_count),
+        )
+
+    def assertCountersMatchNotes(self):
+        for category in Category.objects.annotate(**actual_counts()):
+            with self.subTest(category=category.name):
+                self.assertEqual(
+                    (category.note_count, category.public_note_count, category.subtree_public_count),
+                    (category.actual_note_count, category.actual_public_note_count,
+                     category.actual_subtree_public_count),
+                )
+
+    def test_created(self):
+        self.assertCounts(self.algebra, 1, 1, 1)
+        self.assertCounts(self.maths, 0, 0, 1)
+        self.assertCounts(self.physics, 1, 0, 0)
+        self.assertCounts(self.root, 0, 0, 1)
+        self.assertCountersMatchNotes()
+
+    def test_moved_hidden_and_deleted(self):
+        self.note.category = self.physics
+        self.note.save()
+        self.assertCounts(self.algebra, 0, 0, 0)
+        self.assertCounts(self.maths, 0, 0, 0)
+        self.assertCounts(self.physics, 2, 1, 1)
+        self.assertCounts(self.root, 0, 0, 1)
+
+        self.note.is_public = False
+        self.note.save()
+        self.assertCounts(self.physics, 2, 0, 0)
+        self.assertCounts(self.root, 0, 0, 0)
+
+        self.note.delete()
+        self.assertCounts(self.physics, 1, 0, 0)
+        self.assertCountersMatchNotes()
+
+    def test_stale_instance_moves_once(self):
+        # Two edits loaded the note before either saved
+        first, second = Note.objects.get(pk=self.note.pk), Note.objects.get(pk=self.note.pk)
+        first.category = second.category = self.physics
+        first.save()
+        second.save()
+        self.assertCounts(self.algebra, 0, 0, 0)
+        self.assertCounts(self.physics, 2, 1, 1)
+        self.assertCountersMatchNotes()
+
+    def test_category_moved_with_its_notes(self):
+        self.algebra.parent = self.physics
+        self.algebra.save()
+        self.assertCounts(self.maths, 0, 0, 0)
+        self.assertCounts(self.physics, 1, 0, 1)
+        self.assertCounts(self.root, 0, 0, 1)
+        self.assertCountersMatchNotes()
+
+
+# ---
+# RATING JOBS
+# ---
+class RatingJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.uploader = User.objects.create_user('uploader', password='pw', role='teacher')
+        cls.voters = [User.objects.create_user(f'voter{i}', password='pw') for i in range(2)]
+        cls.notes = [
+            Note.objects.create(title=f'Week {i}', file=f'notes/00/{i:064x}.pdf', uploader=cls.uploader)
+            for i in range(3)
+        ]
+
+    def rate(self, voter, note, value):
+        self.client.force_login(voter)
+        response = self.client.post(reverse('notes:note-rate', args=[note.pk]), {'rating': value}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def rate_batch(self, voter, votes):
+        self.client.force_login(voter)
+        return self.client.post(
+            reverse('notes:rating-batch'),
+            json.dumps({'ratings': [{'note_id': note.pk, 'value': value} for note, value in votes]}),
+            content_type='application/json', secure=True,
+        )
+
+    def run_jobs(self):
+        while (job := claim('test')) is not None:
+            self.assertTrue(run_job(job))
+
+    def assertAggregatesMatchRatings(self, note):
+        note.refresh_from_db()
+        stored = {field: getattr(note, field) for field in Note.RATING_FIELDS}
+        note.update_rating()
+        note.refresh_from_db()
+        for field in Note.RATING_FIELDS:
+            with self.subTest(note=note.pk, field=field):
+                self.assertAlmostEqual(stored[field], getattr(note, field))
+
+    def assertReputation(self, expected):
+        self.uploader.refresh_from_db()
+        self.assertEqual(self.uploader.reputation, expected)
+        ledger = sum(self.uploader.reputation_events.values_list('delta', flat=True))
+        self.assertEqual(self.uploader.reputation, ledger)
+
+    def test_single_votes(self):
+        note = self.notes[0]
+        answer = self.rate(self.voters[0], note, 4)
+        self.rate(self.voters[1], note, 2)
+        self.rate(self.voters[0], note, 5)
+        self.rate(self.voters[0], note, 5)  # unchanged: nothing queued
+        self.assertEqual(Job.objects.filter(name='notes.apply_rating').count(), 3)
+        # The answer previews what the job will store
+        self.assertEqual((answer['total_ratings'], answer['average_rating']), (1, 4.0))
+
+        self.run_jobs()
+        note.refresh_from_db()
+        self.assertEqual((note.total_ratings, note.rating_sum), (2, 7))
+        self.assertEqual([row['count'] for row in note.rating_histogram], [1, 0, 0, 1, 0])
+        self.assertAggregatesMatchRatings(note)
+        # +5 for the 4, -2 for the 2; the 4 becoming a 5 changes nothing
+        self.assertReputation(3)
+
+    def test_batch_votes_queue_one_job(self):
+        self.rate(self.voters[0], self.notes[0], 3)
+        self.run_jobs()
+        response = self.rate_batch(self.voters[0], [(self.notes[0], 5), (self.notes[1], 4), (self.notes[2], 1)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notes'][str(self.notes[0].pk)]['total_ratings'], 1)
+
+        batch_jobs = Job.objects.filter(name='notes.apply_ratings')
+        self.assertEqual(batch_jobs.count(), 1)
+        self.assertEqual(len(batch_jobs.get().payload['changes']), 3)
+        # Sent again: the votes are already stored, so nothing changes
+        self.rate_batch(self.voters[0], [(self.notes[0], 5), (self.notes[1], 4), (self.notes[2], 1)])
+        self.assertEqual(batch_jobs.count(), 1)
+
+        self.run_jobs()
+        for note in self.notes:
+            self.assertAggregatesMatchRatings(note)
+        self.assertReputation(5 + 5 - 2)
+        self.assertEqual(
+            sorted(ReputationEvent.objects.filter(note__in=self.notes).values_list('delta', flat=True)), [-2, 5, 5],
+        )
+
+    def test_invalid_batch_saves_nothing(self):
+        response = self.rate_batch(self.voters[0], [(self.notes[0], 4), (self.notes[1], 6)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1])
+        self.assertFalse(Rating.objects.exists())
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+
+from django.core.files import File
+
+# ---
+# RESUMABLE CHUNKED UPLOADS
+# ---
+# Protocol (all JSON, login required):
+#   POST  /notes/uploads/               {filename, size}  -> {upload_id, offset, chunk_size}
+#   PUT   /notes/uploads/<id>/          raw bytes, header Upload-Offset: <n>  -> {offset, complete, sha256}
+#   GET   /notes/uploads/<id>/          -> {offset, size, complete} (to resume after a dropped connection)
+# The finished upload is attached by submitting NoteForm with `upload_id`.
+#
+# Request bodies are read in STREAM_BLOCK_SIZE pieces and appended to the
+# temp file, so memory per upload stays bounded whatever the file size.
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Running SHA-256 per upload, so each chunk is hashed exactly once as it
+# arrives. hashlib state can't be persisted, so if a chunk lands on another
+# worker process (or after a restart) the hash is rebuilt from the temp file.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class ChunkOffsetMismatch(Exception):
+    """The client's Upload-Offset doesn't match what the server has stored."""
+
+
+class ChunkTooLarge(Exception):
+    """The chunk would go past the declared upload size."""
+
+
+def _hasher_for(session):
+    with _hashers_lock:
+        offset, hasher = _hashers.pop(session.pk, (None, None))
+    if offset == session.offset:
+        return hasher
+    hasher = hashlib.sha256()
+    if session.offset and os.path.exists(session.temp_path):
+        # Only the stored bytes: an interrupted or rejected chunk may have
+        # left more past `offset`, which append_chunk() truncates away
+        remaining = session.offset
+        with open(session.temp_path, 'rb') as fh:
+            while remaining:
+                block = fh.read(min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def append_chunk(session, stream, offset):
+    """
+    Appends the request body `stream` to the session's temp file at `offset`,
+    hashing as it goes. The caller must hold a row lock on `session` and
+    save it afterwards. Returns the number of bytes written.
+    """
+    if offset != session.offset:
+        raise ChunkOffsetMismatch(session.offset)
+
+    hasher = _hasher_for(session)
+    os.makedirs(os.path.dirname(session.temp_path), exist_ok=True)
+    written = 0
+    with open(session.temp_path, 'ab') as fh:
+        # Drop any bytes a previously interrupted request left past `offset`
+        fh.truncate(session.offset)
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            if session.offset + written + len(block) > session.size:
+                raise ChunkTooLarge()
+            fh.write(block)
+            hasher.update(block)
+            written += len(block)
+
+    session.offset += written
+    if session.is_complete:
+        session.sha256 = hasher.hexdigest()
+    else:
+        with _hashers_lock:
+            _hashers[session.pk] = (session.offset, hasher)
+    return written
+
+
+def discard(session):
+    """Removes the temp file and any in-memory hash state of a session."""
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    try:
+        os.remove(session.temp_path)
+    except FileNotFoundError:
+        pass
+
+
+class AssembledUpload(File):
+    """
+    The finished temp file of an upload session. Exposing
+    temporary_file_path() makes FileSystemStorage move it into place
+    instead of copying it, so the file is never read again.
+    """
+
+    def __init__(self, session):
+        super().__init__(open(session.temp_path, 'rb'), name=session.filename)
+        self.size = session.size
+        # Lets ContentAddressedStorage skip hashing the file again
+        self.sha256 = session.sha256
+
+    def temporary_file_path(self):
+        return self.file.name
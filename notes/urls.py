@@ -1,23 +1,41 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'notes'
 
+# Async versions of the read and vote views, for ASGI deployments
+if settings.ASYNC_VIEWS:
+    NoteListView, NoteSearchView = views.AsyncNoteListView, views.AsyncNoteSearchView
+    NoteDetailView, RateNoteView = views.AsyncNoteDetailView, views.AsyncRateNoteView
+else:
+    NoteListView, NoteSearchView = views.NoteListView, views.NoteSearchView
+    NoteDetailView, RateNoteView = views.NoteDetailView, views.RateNoteView
+
 urlpatterns = [
     # /notes/ (List all public notes)
-    path('', views.NoteListView.as_view(), name='note-list'),
+    path('', NoteListView.as_view(), name='note-list'),
     
     # /notes/create/ (Upload a new note)
     path('create/', views.NoteCreateView.as_view(), name='note-create'),
     
+    # /notes/uploads/ (Start a resumable chunked upload)
+    path('uploads/', views.ChunkedUploadStartView.as_view(), name='upload-start'),
+    
+    # /notes/uploads/<id>/ (Append a chunk / check progress of an upload)
+    path('uploads/<uuid:upload_id>/', views.ChunkedUploadView.as_view(), name='upload-chunk'),
+    
+    # /notes/tags/autocomplete/?q=py (JSON tag suggestions for the tag input)
+    path('tags/autocomplete/', views.TagAutocompleteView.as_view(), name='tag-autocomplete'),
+    
     # /notes/my-notes/ (List notes uploaded by the current user)
     path('my-notes/', views.MyNotesView.as_view(), name='my-notes'),
     
     # /notes/search/ (Search results page)
-    path('search/', views.NoteSearchView.as_view(), name='note-search'),
+    path('search/', NoteSearchView.as_view(), name='note-search'),
     
     # /notes/5/ (View a single note's details)
-    path('<int:pk>/', views.NoteDetailView.as_view(), name='note-detail'),
+    path('<int:pk>/', NoteDetailView.as_view(), name='note-detail'),
     
     # /notes/5/edit/ (Edit a note)
     path('<int:pk>/edit/', views.NoteUpdateView.as_view(), name='note-edit'),
@@ -25,6 +43,12 @@ urlpatterns = [
     # /notes/5/delete/ (Delete a note)
     path('<int:pk>/delete/', views.NoteDeleteView.as_view(), name='note-delete'),
     
+    # /notes/5/download/ (Stream the note's file, with Range/ETag support)
+    path('<int:pk>/download/', views.NoteDownloadView.as_view(), name='note-download'),
+    
+    # /notes/ratings/ (JSON: rate many notes at once / read back your ratings of many notes)
+    path('ratings/', views.BatchRatingView.as_view(), name='rating-batch'),
+    
     # /notes/5/rate/ (AJAX endpoint for submitting a rating)
-    path('<int:pk>/rate/', views.RateNoteView.as_view(), name='note-rate'),
+    path('<int:pk>/rate/', RateNoteView.as_view(), name='note-rate'),
 ]
\ No newline at end of file
@@ -1,16 +1,33 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
 from django.views import View
-from django.db.models import Q, Avg, Prefetch
-from django.http import JsonResponse, HttpResponseForbidden
-# This is the import you added, which is correct!
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from .models import Note, Rating, Tag 
+from django.db import transaction
+from django.db.models import (
+    Q, Avg, Prefetch, F, FloatField, Max, Count, OuterRef, Subquery,
+    prefetch_related_objects, aprefetch_related_objects,
+)
+from django.db.models.functions import Cast
+from django.http import JsonResponse, HttpResponseForbidden, Http404
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from .models import Note, Rating, Tag, UploadSession
 from categories.models import Category
+from categories.tree import get_category_tree
+from core.models import ReputationEvent
+from core.conditional import ConditionalPageMixin, aconditional_get
+from core.pagecache import AnonymousPageCacheMixin, agroup_versions, group_versions, normalized_params
+from core.queue import enqueue
 from .forms import NoteForm, RatingForm
+from .pagination import CursorPaginationMixin
+from .downloads import serve_note_file
+from .tags import autocomplete_tags
+from . import uploads
+import json
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from asgiref.sync import sync_to_async
 
 # Mixin to check if user is the owner or a teacher/admin
 class OwnerOrTeacherRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -25,38 +42,71 @@ class OwnerOrTeacherRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
 #
 # --- THIS IS THE UPDATED CLASS ---
 #
-class NoteListView(ListView):
+class NoteListView(AnonymousPageCacheMixin, ConditionalPageMixin, CursorPaginationMixin, ListView):
     model = Note
     template_name = 'notes/note_list.html'
     context_object_name = 'notes'
     paginate_by = 12
+    # Most queries per request, checked by core/query_inspector.py in development and tests
+    query_budget = 7
+    # GET requests may read from a replica (core/dbrouter.py)
+    reads_from_replica = True
+    # Guests get whole pages from the cache (core/pagecache.py)
+    page_cache_params = ('q', 'category', 'sort', 'cursor', 'page')
+
+    def get_page_cache_groups(self):
+        category = self.request.GET.get('category', '')
+        notes = f'notes:category:{category}' if category else 'notes'
+        return [notes, 'categories']
+
+    def get_validators(self):
+        updated = self.get_validator_notes().aggregate(updated=Max('updated_at'))['updated']
+        # ETag only: a note leaving the list doesn't move Max(updated_at), so
+        # a Last-Modified from it would let If-Modified-Since keep it on screen
+        return self.validator_parts(updated, group_versions(self.get_page_cache_groups()), get_category_tree()), None
+
+    def get_validator_notes(self):
+        # Latest change among the public notes the page could show (search
+        # matches before the rank cut-off), by index. Notes leaving the list
+        # (deleted, made private, moved) bump its page cache groups instead.
+        notes = Note.objects.filter(is_public=True)
+        search_query = self.request.GET.get('q', '')
+        category_query = self.request.GET.get('category', '')
+        if search_query:
+            notes = notes.filter(search_vector=SearchQuery(search_query))
+        if category_query:
+            notes = notes.filter(category__pk=category_query)
+        return notes
+
+    def validator_parts(self, updated, group_versions, tree):
+        return [normalized_params(self.request, self.page_cache_params), updated, *group_versions, tree.version]
 
     def get_queryset(self):
         # Start with the base, optimized queryset
-        queryset = Note.objects.filter(is_public=True).select_related('uploader', 'category').prefetch_related('tags')
+        queryset = (
+            Note.objects.filter(is_public=True)
+            .select_related('uploader', 'category').prefetch_related('tags')
+            .defer(*Note.CARD_DEFERRED_FIELDS)
+        )
         
         search_query = self.request.GET.get('q', '')
         category_query = self.request.GET.get('category', '')
         sort_query = self.request.GET.get('sort', '-created_at')
 
         if search_query:
-            # --- NEW: Full-Text Search ---
-            # 1. Define what fields to search against, and with what priority
-            vector = SearchVector('title', weight='A') + \
-                     SearchVector('tags__name', weight='A') + \
-                     SearchVector('description', weight='B') + \
-                     SearchVector('category__name', weight='B') + \
-                     SearchVector('uploader__first_name', weight='C') + \
-                     SearchVector('uploader__last_name', weight='C')
-            
-            # 2. Create the query
+            # --- Full-Text Search against the stored, GIN-indexed vector ---
+            # The weighted document (title/tags > description/category > uploader)
+            # is kept up to date by notes.signals, so this is an index lookup
+            # instead of building tsvectors over five joined tables per request.
             query = SearchQuery(search_query)
             
-            # 3. Filter the queryset by rank, and sort by the most relevant first
-            queryset = queryset.annotate(
-                rank=SearchRank(vector, query)
+            # Match through the index, then sort by the most relevant first.
+            # The rank is cast to double precision so it survives a round
+            # trip through a page cursor exactly.
+            queryset = queryset.filter(search_vector=query).annotate(
+                rank=Cast(SearchRank(F('search_vector'), query), FloatField())
             ).filter(rank__gte=0.1).order_by('-rank')
-            # --- END NEW SEARCH ---
+            # --- END SEARCH ---
         
         elif category_query:
             # Only filter by category if not searching
@@ -71,12 +121,21 @@ class NoteListView(ListView):
             # OPTIONAL: If you want to filter by category *on top of* search results
             queryset = queryset.filter(category__pk=category_query)
 
-        # .distinct() is still good practice when joining on ManyToMany fields (like tags)
-        return queryset.distinct()
+        # No ManyToMany join any more, so no .distinct() needed
+        return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context.update(self.get_list_context(get_category_tree()))
+        return context
+
+    def get_list_context(self, tree):
+        """Everything on the page besides the notes; no queries."""
+        context = {}
+        # Nested dropdown straight from the cached tree. Passed uncalled:
+        # the template only walks it when its cached fragment is stale
+        context['categories'] = tree.walk
+        context['category_tree_version'] = tree.version
         context['search_query'] = self.request.GET.get('q', '')
         # Convert category_query to int for proper comparison in template if it exists
         try:
@@ -90,24 +149,46 @@ class NoteListView(ListView):
 #
 
 
-class NoteDetailView(DetailView):
+class NoteDetailView(ConditionalPageMixin, DetailView):
     model = Note
     template_name = 'notes/note_detail.html'
     context_object_name = 'note'
+    query_budget = 9
+    reads_from_replica = True
     
     def get_queryset(self):
-        return super().get_queryset().select_related('uploader', 'category').prefetch_related('tags')
+        queryset = super().get_queryset().select_related('uploader', 'category')
+        if self.request.user.is_authenticated:
+            # The viewer's own vote, in the same query
+            queryset = queryset.annotate(user_rating_value=Subquery(
+                Rating.objects.filter(note=OuterRef('pk'), user=self.request.user).values('value')[:1]
+            ))
+        return queryset
+
+    def get_object(self, queryset=None):
+        # Loaded once, for the validators and then for the page
+        if getattr(self, 'object', None) is None:
+            self.object = super().get_object(queryset)
+        return self.object
+
+    def get_validators(self):
+        note = self.get_object()
+        # updated_at also moves on votes and on tag, category or uploader changes
+        parts = [note.pk, note.updated_at, getattr(note, 'user_rating_value', None)]
+        parts += [getattr(note, f'rating_count_{stars}') for stars in range(1, 6)]
+        return parts, note.updated_at
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        note = self.get_object()
+        note = self.object
+        # Only now that the page is actually rendered
+        prefetch_related_objects([note], 'tags')
         
         if not note.is_public and self.request.user != note.uploader and not self.request.user.is_staff:
              pass
 
         if self.request.user.is_authenticated:
-            user_rating = Rating.objects.filter(note=note, user=self.request.user).first()
-            context['user_rating_value'] = user_rating.value if user_rating else 0
+            context['user_rating_value'] = note.user_rating_value or 0
         
         context['rating_form'] = RatingForm()
         return context
@@ -118,6 +199,11 @@ class NoteCreateView(LoginRequiredMixin, CreateView):
     template_name = 'notes/note_form.html'
     success_url = reverse_lazy('notes:note-list')
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form_title'] = "Upload a New Note"
@@ -125,23 +211,28 @@ class NoteCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.uploader = self.request.user
-        
-        # --- NEW: "VILLAIN ARC" REPUTATION LOGIC ---
-        # Get the uploader object
-        uploader = self.request.user
-        # Grant reputation for uploading a new note
-        uploader.reputation += 10 
-        uploader.save()
-        # --- END NEW ---
+        with transaction.atomic():
+            response = super().form_valid(form)
+
+            # --- "VILLAIN ARC" REPUTATION LOGIC ---
+            # Grant reputation for uploading a new note (applied by a background job)
+            enqueue('core.record_reputation', user_id=self.request.user.pk, delta=10,
+                    reason=ReputationEvent.NOTE_UPLOADED, note_id=self.object.pk)
+            # --- END ---
         
         messages.success(self.request, "Note has been uploaded successfully! (+10 REP)")
-        return super().form_valid(form)
+        return response
 
 class NoteUpdateView(OwnerOrTeacherRequiredMixin, UpdateView):
     model = Note
     form_class = NoteForm
     template_name = 'notes/note_form.html'
     
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def get_queryset(self):
         return super().get_queryset().prefetch_related('tags')
 
@@ -163,99 +254,341 @@ class NoteDeleteView(OwnerOrTeacherRequiredMixin, DeleteView):
     success_url = reverse_lazy('notes:note-list')
     
     def form_valid(self, form):
-        # --- NEW: "VILLAIN ARC" REPUTATION LOGIC ---
-        # Penalize for deleting a note
-        uploader = self.object.uploader
-        uploader.reputation -= 10 # -10 rep for deleting
-        uploader.save()
-        # --- END NEW ---
+        # --- "VILLAIN ARC" REPUTATION LOGIC ---
+        # Penalize for deleting a note (-10 rep)
+        ReputationEvent.objects.record(self.object.uploader, -10, ReputationEvent.NOTE_DELETED, note=self.object)
+        # --- END ---
         
         messages.success(self.request, f'Note "{self.object.title}" has been deleted. (-10 REP)')
         return super().form_valid(form)
 
+def rating_summary(note, user_rating):
+    """A note's rating aggregates as the rating endpoints return them."""
+    return {
+        'average_rating': round(note.average_rating, 1),
+        'total_ratings': note.total_ratings,
+        'rating_histogram': note.rating_histogram,
+        'user_rating': user_rating,
+    }
+
 class RateNoteView(LoginRequiredMixin, View):
     """
     Handles POST requests to rate a note.
     This view is designed to be called via AJAX (Fetch API).
     """
+    query_budget = 9
+
     def post(self, request, pk):
+        note = get_object_or_404(Note.objects.select_related('uploader'), pk=pk)
+        rating_value, error = self.clean_vote(request, note)
+        if error is not None:
+            return error
+        old_value, rating = self.save_vote(note, request.user, rating_value)
+        return self.vote_response(note, old_value, rating)
+
+    def clean_vote(self, request, note):
+        """Returns (rating value, None), or (None, error response)."""
         try:
-            note = get_object_or_404(Note.objects.select_related('uploader'), pk=pk)
             rating_value = int(request.POST.get('rating'))
         except (ValueError, TypeError):
-            return JsonResponse({'success': False, 'error': 'Invalid rating value.'}, status=400)
+            return None, JsonResponse({'success': False, 'error': 'Invalid rating value.'}, status=400)
         
         if not (1 <= rating_value <= 5):
-            return JsonResponse({'success': False, 'error': 'Rating must be between 1 and 5.'}, status=400)
+            return None, JsonResponse({'success': False, 'error': 'Rating must be between 1 and 5.'}, status=400)
             
         if note.uploader == request.user:
-            return JsonResponse({'success': False, 'error': 'You cannot rate your own note.'}, status=403)
+            return None, JsonResponse({'success': False, 'error': 'You cannot rate your own note.'}, status=403)
+        return rating_value, None
 
-        # Find existing rating
-        existing_rating = Rating.objects.filter(note=note, user=request.user).first()
-        
-        # --- NEW: "VILLAIN ARC" REPUTATION LOGIC ---
-        uploader = note.uploader
+    def save_vote(self, note, user, rating_value):
+        """Stores the vote and queues the aggregate update; returns (previous value, rating)."""
+        with transaction.atomic():
+            # Votes on one note are serialized on the note row: a first vote
+            # has no Rating row to lock, and two concurrent ones would both
+            # see old_value=None and be counted twice
+            get_object_or_404(Note.objects.select_for_update().only('pk'), pk=note.pk)
+            existing_rating = Rating.objects.filter(note=note, user=user).first()
+
+            # Find existing rating or create a new one
+            rating, created = Rating.objects.update_or_create(
+                note=note,
+                user=user,
+                defaults={'value': rating_value}
+            )
+            old_value = existing_rating.value if existing_rating else None
+
+            # --- Aggregates and "VILLAIN ARC" reputation are updated by a background job ---
+            # Queued in the same transaction, so it runs exactly when the vote is committed
+            if old_value != rating.value:
+                enqueue('notes.apply_rating', note_id=note.pk, rating_id=rating.pk,
+                        old_value=old_value, new_value=rating.value)
+        return old_value, rating
+
+    def vote_response(self, note, old_value, rating):
         rep_message = ""
+        if rating.value >= 4:
+            rep_message = "(+5 REP for uploader)"
+        elif rating.value <= 2:
+            rep_message = "(-2 REP for uploader)"
 
-        if existing_rating:
-            # User is CHANGING their rating
-            old_value = existing_rating.value
-            
-            # Revert old reputation change
-            if old_value >= 4:
-                uploader.reputation -= 5
-            elif old_value <= 2:
-                uploader.reputation += 2
-                
-            # Apply new reputation change
-            if rating_value >= 4:
-                uploader.reputation += 5
-                rep_message = "(+5 REP for uploader)"
-            elif rating_value <= 2:
-                uploader.reputation -= 2
-                rep_message = "(-2 REP for uploader)"
-        
-        else:
-            # User is CREATING a new rating
-            if rating_value >= 4:
-                uploader.reputation += 5
-                rep_message = "(+5 REP for uploader)"
-            elif rating_value <= 2:
-                uploader.reputation -= 2
-                rep_message = "(-2 REP for uploader)"
-        
-        uploader.save()
-        # --- END NEW ---
-
-        # Find existing rating or create a new one
-        rating, created = Rating.objects.update_or_create(
-            note=note,
-            user=request.user,
-            defaults={'value': rating_value}
-        )
-        
-        # --- NEW: EXPLICITLY UPDATE NOTE RATING ---
-        # This fixes the bug from the seeder
-        note.update_rating()
-        # --- END NEW ---
+        # Answer with what the aggregates will be once the job has run
+        note.preview_rating_change(old_value=old_value, new_value=rating.value)
 
         return JsonResponse({
             'success': True,
-            'average_rating': round(note.average_rating, 1),
-            'total_ratings': note.total_ratings,
-            'user_rating': rating.value,
+            **rating_summary(note, rating.value),
             'message': f'Rating submitted! {rep_message}'
         })
 
-class MyNotesView(LoginRequiredMixin, ListView):
+class BatchRatingView(LoginRequiredMixin, View):
+    """
+    JSON API for rating many notes in one request (e.g. a teacher reviewing
+    a whole category), and for reading back the user's ratings of many notes.
+
+        GET  ?ids=1,2,3
+             -> {"success": true, "ratings": {"1": 4, "2": null, "3": 5}}
+        POST {"ratings": [{"note_id": 1, "value": 4}, ...]}
+             -> {"success": true, "notes": {"1": {"average_rating": ..., ...}}}
+
+    A POST is validated as a whole: if any pair is invalid nothing is saved
+    and every problem is reported, by its position in the list.
+    """
+    query_budget = 9
+    reads_from_replica = True
+
+    def get(self, request):
+        try:
+            note_ids = list(dict.fromkeys(int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'ids must be a comma-separated list of note ids.'}, status=400)
+        error = self.check_size(note_ids)
+        if error is not None:
+            return error
+
+        ratings = dict(Rating.objects.filter(user=request.user, note_id__in=note_ids).values_list('note_id', 'value'))
+        return JsonResponse({'success': True, 'ratings': {str(pk): ratings.get(pk) for pk in note_ids}})
+
+    def post(self, request):
+        try:
+            pairs = json.loads(request.body)['ratings']
+        except (ValueError, TypeError, KeyError):
+            pairs = None
+        if not isinstance(pairs, list):
+            return JsonResponse({'success': False, 'error': 'Expected a JSON object with a "ratings" list.'}, status=400)
+        error = self.check_size(pairs)
+        if error is not None:
+            return error
+
+        notes, votes, errors = self.clean_votes(request.user, pairs)
+        if errors:
+            return JsonResponse(
+                {'success': False, 'error': 'No ratings were saved.', 'errors': errors}, status=400,
+            )
+        old_values = self.save_votes(request.user, votes)
+
+        # Answer with what the aggregates will be once the job has run
+        results = {}
+        for pk, value in votes.items():
+            note = notes[pk]
+            note.preview_rating_change(old_value=old_values.get(pk), new_value=value)
+            results[str(pk)] = rating_summary(note, value)
+        return JsonResponse({'success': True, 'notes': results})
+
+    def check_size(self, items):
+        if not items:
+            return JsonResponse({'success': False, 'error': 'No notes given.'}, status=400)
+        if len(items) > settings.RATING_BATCH_MAX_SIZE:
+            return JsonResponse(
+                {'success': False, 'error': f'At most {settings.RATING_BATCH_MAX_SIZE} notes per request.'}, status=400,
+            )
+        return None
+
+    def clean_votes(self, user, pairs):
+        """Returns ({note id: note}, {note id: value}, errors), checking every pair."""
+        errors, votes, positions = [], {}, {}
+        for index, pair in enumerate(pairs):
+            try:
+                # Through str(), so 4.5 or true are rejected like in a form
+                note_id, value = int(str(pair['note_id'])), int(str(pair['value']))
+            except (KeyError, TypeError, ValueError):
+                errors.append({'index': index, 'error': 'Expected {"note_id": <id>, "value": <1-5>}.'})
+                continue
+            if not (1 <= value <= 5):
+                errors.append({'index': index, 'note_id': note_id, 'error': 'Rating must be between 1 and 5.'})
+            elif note_id in votes:
+                errors.append({'index': index, 'note_id': note_id, 'error': 'Note rated more than once.'})
+            else:
+                votes[note_id], positions[note_id] = value, index
+
+        # All the notes in one query, with what the answer's preview needs
+        notes = Note.objects.only('uploader', *Note.RATING_FIELDS).in_bulk(list(votes)) if votes else {}
+        for note_id, index in positions.items():
+            note = notes.get(note_id)
+            if note is None:
+                errors.append({'index': index, 'note_id': note_id, 'error': 'No note found with this id.'})
+            elif note.uploader_id == user.pk:
+                errors.append({'index': index, 'note_id': note_id, 'error': 'You cannot rate your own note.'})
+        errors.sort(key=lambda error: error['index'])
+        return notes, votes, errors
+
+    def save_votes(self, user, votes):
+        """
+        Upserts all the votes with one INSERT ... ON CONFLICT and queues one
+        job for the aggregates and reputation. Returns {note id: previous value}.
+        """
+        with transaction.atomic():
+            # The notes are locked first, as in RateNoteView.save_vote(), so a
+            # repeated batch can't read the same old values; in pk order, so
+            # overlapping batches can't deadlock
+            list(Note.objects.select_for_update().filter(pk__in=votes).order_by('pk').values_list('pk', flat=True))
+            old_values = dict(
+                Rating.objects.filter(user=user, note_id__in=votes).values_list('note_id', 'value')
+            )
+            ratings = Rating.objects.bulk_create(
+                [Rating(note_id=pk, user=user, value=votes[pk]) for pk in sorted(votes)],
+                update_conflicts=True, unique_fields=['note', 'user'], update_fields=['value'],
+            )
+            changes = [
+                [rating.note_id, rating.pk, old_values.get(rating.note_id), rating.value]
+                for rating in ratings if old_values.get(rating.note_id) != rating.value
+            ]
+            if changes:
+                enqueue('notes.apply_ratings', changes=changes)
+        return old_values
+
+class NoteDownloadView(View):
+    """
+    Streams a note's file. Public notes are open to everyone (like the
+    detail page); private ones only to the uploader, teachers and staff.
+    Supports byte ranges and conditional requests, see notes/downloads.py.
+    """
+    def get(self, request, pk):
+        note = get_object_or_404(Note.objects.only('title', 'file', 'file_sha256', 'is_public', 'uploader_id'), pk=pk)
+        user = request.user
+        can_see_private = user.is_authenticated and (
+            note.uploader_id == user.pk or user.is_staff or user.is_teacher()
+        )
+        if not note.file or not (note.is_public or can_see_private):
+            raise Http404("No such file.")
+
+        try:
+            # ?inline=1 is used by the in-page PDF preview
+            return serve_note_file(request, note, as_attachment=not request.GET.get('inline'))
+        except FileNotFoundError:
+            raise Http404("No such file.")
+
+class ChunkedUploadStartView(LoginRequiredMixin, View):
+    """
+    Starts a resumable upload (see notes/uploads.py for the protocol).
+    Expects JSON {"filename": ..., "size": ...}.
+    """
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            filename = str(data['filename']).rsplit('/', 1)[-1][:255]
+            size = int(data['size'])
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'success': False, 'error': 'filename and size are required.'}, status=400)
+
+        if not filename or size <= 0:
+            return JsonResponse({'success': False, 'error': 'Invalid filename or size.'}, status=400)
+        if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            return JsonResponse({'success': False, 'error': 'File is too large.'}, status=413)
+
+        session = UploadSession.objects.create(user=request.user, filename=filename, size=size)
+        return JsonResponse({
+            'success': True,
+            'upload_id': str(session.pk),
+            'offset': 0,
+            'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        }, status=201)
+
+class ChunkedUploadView(LoginRequiredMixin, View):
+    """
+    GET reports how much of an upload the server has (to resume);
+    PUT appends the raw request body at the `Upload-Offset` header.
+    """
+    def _status(self, session):
+        return {
+            'success': True,
+            'upload_id': str(session.pk),
+            'offset': session.offset,
+            'size': session.size,
+            'complete': session.is_complete,
+            'sha256': session.sha256,
+        }
+
+    def get(self, request, upload_id):
+        session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+        return JsonResponse(self._status(session))
+
+    def put(self, request, upload_id):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Upload-Offset header is required.'}, status=400)
+
+        with transaction.atomic():
+            session = get_object_or_404(UploadSession.objects.select_for_update(), pk=upload_id, user=request.user)
+            try:
+                uploads.append_chunk(session, request, offset)
+            except uploads.ChunkOffsetMismatch:
+                # Tell the client where to resume from
+                return JsonResponse(dict(self._status(session), success=False, error='Offset mismatch.'), status=409)
+            except uploads.ChunkTooLarge:
+                return JsonResponse({'success': False, 'error': 'Chunk exceeds the declared size.'}, status=413)
+            session.save(update_fields=['offset', 'sha256', 'updated_at'])
+
+        return JsonResponse(self._status(session))
+
+    def delete(self, request, upload_id):
+        session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+        uploads.discard(session)
+        session.delete()
+        return JsonResponse({'success': True})
+
+class TagAutocompleteView(View):
+    """
+    JSON tag suggestions for the Tagify input: tags starting with ?q=,
+    most used first. Cheap enough to be called on every keystroke.
+    """
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 25
+    reads_from_replica = True
+
+    def get(self, request):
+        prefix = request.GET.get('q', '')[:100]
+        try:
+            limit = min(max(int(request.GET.get('limit', self.DEFAULT_LIMIT)), 1), self.MAX_LIMIT)
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
+
+        results = [
+            {'value': tag['name'], 'slug': tag['slug'], 'count': tag['note_count']}
+            for tag in autocomplete_tags(prefix, limit)
+        ]
+        response = JsonResponse({'results': results})
+        patch_cache_control(response, public=True, max_age=settings.TAG_AUTOCOMPLETE_CACHE_TIMEOUT)
+        return response
+
+class MyNotesView(LoginRequiredMixin, ConditionalPageMixin, CursorPaginationMixin, ListView):
     model = Note
     template_name = 'notes/note_list.html' 
     context_object_name = 'notes'
     paginate_by = 12
+    query_budget = 7
+
+    def get_validators(self):
+        latest = Note.objects.filter(uploader=self.request.user).aggregate(updated=Max('updated_at'), count=Count('pk'))
+        parts = [normalized_params(self.request, ('sort', 'cursor', 'page')), latest['updated'], latest['count']]
+        return parts, latest['updated']
 
     def get_queryset(self):
-        queryset = Note.objects.filter(uploader=self.request.user).select_related('uploader', 'category').prefetch_related('tags')
+        queryset = (
+            Note.objects.filter(uploader=self.request.user)
+            .select_related('uploader', 'category').prefetch_related('tags')
+            .defer(*Note.CARD_DEFERRED_FIELDS)
+        )
         
         sort_query = self.request.GET.get('sort', '-created_at')
         if sort_query in ['-average_rating', '-created_at', 'title']:
@@ -272,8 +605,91 @@ class MyNotesView(LoginRequiredMixin, ListView):
 class NoteSearchView(NoteListView):
     template_name = 'notes/note_list.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_list_context(self, tree):
+        context = super().get_list_context(tree)
         query = self.request.GET.get('q', '')
         context['page_title'] = f"Search Results for \"{query}\""
-        return context
\ No newline at end of file
+        return context
+
+
+# ---
+# ASYNC VIEWS (ASGI)
+# ---
+# The same pages for an ASGI server (edushare_project/asgi.py), used
+# instead of the classes above when ASYNC_VIEWS is set (see notes/urls.py).
+# Their queries go through the async ORM (aget, aaggregate, async for), so
+# a request waiting on PostgreSQL holds no worker thread; templates and the
+# vote transaction still run in Django's per-request sync thread.
+# request.user is loaded up front by core.middleware.AsyncUserMiddleware.
+
+
+class AsyncNoteListView(NoteListView):
+
+    async def get(self, request, *args, **kwargs):
+        return await aconditional_get(request, self.aget_validators, self.arender_page)
+
+    async def aget_validators(self):
+        notes = self.get_validator_notes()
+        updated = (await notes.aaggregate(updated=Max('updated_at')))['updated']
+        versions = await agroup_versions(self.get_page_cache_groups())
+        tree = await sync_to_async(get_category_tree)()
+        return self.validator_parts(updated, versions, tree), None
+
+    async def arender_page(self):
+        self.object_list = self.get_queryset()
+        paginator, page, notes, is_paginated = await self.apaginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        context = {
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': is_paginated,
+            'object_list': notes,
+            self.get_context_object_name(notes): notes,
+        }
+        context.update(self.get_list_context(await sync_to_async(get_category_tree)()))
+        return self.render_to_response(context)
+
+
+class AsyncNoteSearchView(AsyncNoteListView, NoteSearchView):
+    pass
+
+
+class AsyncNoteDetailView(NoteDetailView):
+
+    async def get(self, request, *args, **kwargs):
+        return await aconditional_get(request, self.aget_validators, self.arender_page)
+
+    async def aget_object(self):
+        if getattr(self, 'object', None) is None:
+            self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        return self.object
+
+    async def aget_validators(self):
+        await self.aget_object()
+        return self.get_validators()
+
+    async def arender_page(self):
+        note = await self.aget_object()
+        # get_context_data() then finds the tags already loaded
+        await aprefetch_related_objects([note], 'tags')
+        return self.render_to_response(self.get_context_data(object=note))
+
+
+class AsyncRateNoteView(RateNoteView):
+
+    async def dispatch(self, request, *args, **kwargs):
+        # LoginRequiredMixin.dispatch() would return a plain response here
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await View.dispatch(self, request, *args, **kwargs)
+
+    async def post(self, request, pk):
+        note = await aget_object_or_404(Note.objects.select_related('uploader'), pk=pk)
+        rating_value, error = self.clean_vote(request, note)
+        if error is not None:
+            return error
+        # One transaction with a row lock: in a single thread
+        old_value, rating = await sync_to_async(self.save_vote)(note, request.user, rating_value)
+        return self.vote_response(note, old_value, rating)